@@ -0,0 +1,36 @@
+import argparse
+import sys
+from typing import List
+
+from benchmarks.compare import compare_files
+from benchmarks.models import SCENARIOS
+from benchmarks.runner import run, save
+
+
+def main(input_args: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="sub_command", required=True)
+
+    parser_run = subparsers.add_parser("run")
+    parser_run.add_argument("--output", type=str, dest="output", required=True)
+    parser_run.add_argument("--scenario", type=str, dest="scenarios", action="append", choices=list(SCENARIOS))
+    parser_run.add_argument("--filter", type=str, dest="pattern")
+    parser_run.add_argument("--min-time", type=float, dest="min_time", default=0.2)
+
+    parser_compare = subparsers.add_parser("compare")
+    parser_compare.add_argument("baseline", type=str)
+    parser_compare.add_argument("current", type=str)
+    parser_compare.add_argument("--threshold", type=float, dest="threshold", default=0.1)
+
+    args = parser.parse_args(input_args)
+
+    if args.sub_command == "run":
+        save(run(args.scenarios, args.pattern, args.min_time), args.output)
+    elif args.sub_command == "compare":
+        if not compare_files(args.baseline, args.current, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,60 @@
+import json
+from typing import List, NamedTuple
+
+
+class Change(NamedTuple):
+    """Relative change of a single metric of a benchmark between two runs"""
+
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    ratio: float
+    regression: bool
+
+
+# For these metrics a higher value is better, for all others a lower value is better
+HIGHER_IS_BETTER = {"ops_per_sec"}
+COMPARED_METRICS = ["ops_per_sec", "peak_memory"]
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> List[Change]:
+    """
+    Compare two benchmark runs
+
+    :param baseline: result of ``benchmarks.runner.run`` to compare against
+    :param current: result of ``benchmarks.runner.run`` to check
+    :param threshold: relative change that is considered a regression, 0.1 means 10% worse
+    :return: changes of all benchmarks and metrics present in both runs
+    """
+    changes = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in base or metric not in result:
+                # Runs saved by older versions of the benchmarks miss newer metrics
+                continue
+            b, c = base[metric], result[metric]
+            ratio = c / b if b else (1.0 if c == b else float("inf"))
+            if metric in HIGHER_IS_BETTER:
+                regression = ratio < 1 - threshold
+            else:
+                regression = ratio > 1 + threshold
+            changes.append(Change(name, metric, b, c, ratio, regression))
+    return changes
+
+
+def compare_files(baseline_path: str, current_path: str, threshold: float = 0.1) -> bool:
+    """Print the comparison of two saved runs, returns True when there are no regressions"""
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    with open(current_path) as fh:
+        current = json.load(fh)
+
+    changes = compare(baseline, current, threshold)
+    for c in changes:
+        flag = "REGRESSION" if c.regression else ""
+        print(f"{c.name:<40} {c.metric:<12} {c.baseline:>14.1f} {c.current:>14.1f} {c.ratio:>7.2f}x {flag}")
+    return not any(c.regression for c in changes)
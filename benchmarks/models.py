@@ -0,0 +1,92 @@
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Type
+
+from pydantic import create_model
+
+from pydantic_avro.base import AvroBase
+
+_SCALARS: List[type] = [str, int, float, bool, datetime]
+
+
+class Shape(NamedTuple):
+    """Parameters of a synthetic model"""
+
+    width: int = 10
+    depth: int = 1
+    union_density: float = 0.0
+    arrays: int = 0
+    maps: int = 0
+
+
+SCENARIOS: Dict[str, Shape] = {
+    "flat": Shape(width=10),
+    "wide": Shape(width=100),
+    "deep": Shape(width=5, depth=5),
+    "unions": Shape(width=20, union_density=0.8),
+    "collections": Shape(width=10, arrays=5, maps=5),
+}
+
+
+def make_model(name: str, shape: Shape) -> Type[AvroBase]:
+    """
+    Create an AvroBase model with the given shape
+
+    Every level has ``width`` scalar fields of which ``union_density`` are optional, ``arrays`` list fields and
+    ``maps`` dict fields. When ``depth`` is more than 1 every level gets a field with the model of the next level.
+    """
+    child: Optional[Type[AvroBase]] = None
+    for level in reversed(range(shape.depth)):
+        fields: Dict[str, Any] = {}
+        optional = int(round(shape.width * shape.union_density))
+        for i in range(shape.width):
+            t = _SCALARS[i % len(_SCALARS)]
+            if i < optional:
+                fields[f"f{i}"] = (Optional[t], None)
+            else:
+                fields[f"f{i}"] = (t, ...)
+        for i in range(shape.arrays):
+            fields[f"a{i}"] = (List[_SCALARS[i % len(_SCALARS)]], ...)
+        for i in range(shape.maps):
+            fields[f"m{i}"] = (Dict[str, _SCALARS[i % len(_SCALARS)]], ...)
+        if child is not None:
+            fields["child"] = (child, ...)
+        model_name = name if level == 0 else f"{name}Level{level}"
+        child = create_model(model_name, __base__=AvroBase, **fields)  # type: ignore
+    assert child is not None
+    return child
+
+
+def _value(t: type, rnd: random.Random) -> Any:
+    if t is str:
+        return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(5, 20)))
+    if t is int:
+        return rnd.randint(-(2**40), 2**40)
+    if t is float:
+        return rnd.random() * 1000
+    if t is bool:
+        return rnd.random() < 0.5
+    if t is datetime:
+        return datetime(2020, 1, 1) + timedelta(microseconds=rnd.randint(0, 10**14))
+    raise NotImplementedError(f"Type {t} not supported")
+
+
+def make_instance(model: Type[AvroBase], shape: Shape, seed: int = 0) -> AvroBase:
+    """Create a deterministic instance of a model created by ``make_model``"""
+    rnd = random.Random(seed)
+
+    def level_data(depth: int) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        optional = int(round(shape.width * shape.union_density))
+        for i in range(shape.width):
+            t = _SCALARS[i % len(_SCALARS)]
+            data[f"f{i}"] = None if i < optional and rnd.random() < 0.5 else _value(t, rnd)
+        for i in range(shape.arrays):
+            data[f"a{i}"] = [_value(_SCALARS[i % len(_SCALARS)], rnd) for _ in range(rnd.randint(0, 10))]
+        for i in range(shape.maps):
+            data[f"m{i}"] = {f"k{j}": _value(_SCALARS[i % len(_SCALARS)], rnd) for j in range(rnd.randint(0, 10))}
+        if depth + 1 < shape.depth:
+            data["child"] = level_data(depth + 1)
+        return data
+
+    return model.parse_obj(level_data(0))
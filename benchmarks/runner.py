@@ -0,0 +1,146 @@
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastavro import parse_schema, reader, schemaless_reader, schemaless_writer, writer
+
+from benchmarks.models import SCENARIOS, Shape, make_instance, make_model
+from pydantic_avro.avro_to_pydantic import avsc_to_pydantic
+
+OCF_RECORDS = 1000
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2) -> Dict[str, float]:
+    """
+    Measure a single benchmark function
+
+    Throughput is measured without tracing, memory is measured in a separate traced run because tracemalloc slows
+    down every allocation. Retained blocks are the memory blocks allocated by the op that are still alive after it,
+    tracemalloc does not count blocks that are freed again.
+
+    :return: dict with ops_per_sec, mean_us, peak_memory, retained_memory and retained_blocks, memory in bytes per op
+    """
+    func()
+
+    iterations = 1
+    while True:
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        iterations *= 2
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        func()
+        after, peak = tracemalloc.get_traced_memory()
+        # Only allocations made after tracing started are in the snapshot
+        retained_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": iterations / elapsed,
+        "mean_us": elapsed / iterations * 1e6,
+        "peak_memory": max(peak - before, 0),
+        "retained_memory": max(after - before, 0),
+        "retained_blocks": retained_blocks,
+    }
+
+
+def scenario_benchmarks(name: str, shape: Shape, tmp_dir: str) -> List[Tuple[str, Callable[[], object]]]:
+    """Return the benchmark functions for all phases of a single scenario, files are written in ``tmp_dir``"""
+    model = make_model(f"Bench{name.title()}", shape)
+    instance = make_instance(model, shape)
+    records = [make_instance(model, shape, seed=i).dict() for i in range(OCF_RECORDS)]
+    avro_schema = model.avro_schema()
+    parsed_schema = parse_schema(avro_schema)
+
+    buffer = io.BytesIO()
+    schemaless_writer(buffer, parsed_schema, instance.dict())
+    encoded = buffer.getvalue()
+
+    path = os.path.join(tmp_dir, f"{name}.avro")
+    with open(path, "wb") as fh:
+        writer(fh, parsed_schema, records)
+
+    def encode():
+        out = io.BytesIO()
+        schemaless_writer(out, parsed_schema, instance.dict())
+        return out.getvalue()
+
+    def decode():
+        return model.parse_obj(schemaless_reader(io.BytesIO(encoded), parsed_schema))
+
+    buffer = bytearray()
+    view = memoryview(encoded)
+
+    def avro_encode_into():
+        return instance.avro_encode_into(buffer)
+
+    def avro_decode():
+        return model.avro_decode(view)
+
+    def ocf_write():
+        with open(os.path.join(tmp_dir, "write.avro"), "wb") as fh:
+            writer(fh, parsed_schema, records)
+
+    def ocf_read():
+        with open(path, "rb") as fh:
+            return [model.parse_obj(r) for r in reader(fh)]
+
+    return [
+        ("avro_schema", model.avro_schema),
+        ("avsc_to_pydantic", lambda: avsc_to_pydantic(avro_schema)),
+        ("encode", encode),
+        ("decode", decode),
+        ("avro_encode_into", avro_encode_into),
+        ("avro_decode", avro_decode),
+        ("ocf_write", ocf_write),
+        ("ocf_read", ocf_read),
+    ]
+
+
+def run(scenarios: Optional[Iterable[str]] = None, pattern: Optional[str] = None, min_time: float = 0.2) -> dict:
+    """
+    Run the benchmarks
+
+    :param scenarios: names of the scenarios to run, default all in ``SCENARIOS``
+    :param pattern: only run benchmarks which name contains this string
+    :param min_time: minimal time in seconds to spend in each benchmark
+    :return: dict with the environment and the results per benchmark name
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix="pydantic-avro-bench-") as tmp_dir:
+        for scenario in scenarios or SCENARIOS:
+            for phase, func in scenario_benchmarks(scenario, SCENARIOS[scenario], tmp_dir):
+                name = f"{scenario}/{phase}"
+                if pattern is not None and pattern not in name:
+                    continue
+                results[name] = measure(func, min_time)
+                print(f"{name:<40} {results[name]['ops_per_sec']:>14.1f} ops/sec", file=sys.stderr)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "min_time": min_time,
+        "results": results,
+    }
+
+
+def save(result: dict, output_path: str):
+    with open(output_path, "w") as fh:
+        json.dump(result, fh, indent=2, sort_keys=True)
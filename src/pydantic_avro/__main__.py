@@ -3,6 +3,7 @@ import sys
 from typing import List
 
 from pydantic_avro.avro_to_pydantic import convert_file
+from pydantic_avro.pydantic_to_avro import convert_modules
 
 
 def main(input_args: List[str]):
@@ -13,10 +14,18 @@ def main(input_args: List[str]):
     parser_cache.add_argument("--asvc", type=str, dest="avsc", required=True)
     parser_cache.add_argument("--output", type=str, dest="output")
 
+    parser_modules = subparsers.add_parser("pydantic_to_avro")
+    parser_modules.add_argument("--module", type=str, dest="modules", action="append", required=True)
+    parser_modules.add_argument("--output", type=str, dest="output")
+    parser_modules.add_argument("--namespace", type=str, dest="namespace")
+    parser_modules.add_argument("--deduplicate", action="store_true", dest="deduplicate")
+
     args = parser.parse_args(input_args)
 
     if args.sub_command == "avro_to_pydantic":
         convert_file(args.avsc, args.output)
+    elif args.sub_command == "pydantic_to_avro":
+        convert_modules(args.modules, args.output, args.namespace, args.deduplicate)
 
 
 def root_main():
@@ -1,9 +1,21 @@
 import json
+import time
 from typing import Optional, Union
 
+from pydantic_avro import instrumentation
+
 
 def avsc_to_pydantic(schema: dict) -> str:
     """Generate python code of pydantic of given Avro Schema"""
+    if not instrumentation.enabled:
+        return _avsc_to_pydantic(schema)
+    start = time.perf_counter()
+    file_content = _avsc_to_pydantic(schema)
+    instrumentation.record("avsc_to_pydantic", schema["name"], start, len(file_content))
+    return file_content
+
+
+def _avsc_to_pydantic(schema: dict) -> str:
     if "type" not in schema or schema["type"] != "record":
         raise AttributeError("Type not supported")
     if "name" not in schema:
@@ -55,8 +67,8 @@ def avsc_to_pydantic(schema: dict) -> str:
                     enum_class += f'    {s} = "{s}"\n'
                 classes[enum_name] = enum_class
             py_type = enum_name
-        elif t.get("type") == "string":
-            py_type = "str"
+        elif t.get("type") in ("string", "long", "int", "boolean", "double", "float"):
+            py_type = get_python_type(t["type"])
         elif t.get("type") == "array":
             sub_type = get_python_type(t.get("items"))
             py_type = f"List[{sub_type}]"
@@ -1,33 +1,185 @@
-from typing import Any, Dict, List, Optional
+import json
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Type, TypeVar, Union
 
 from pydantic import BaseModel
 
+from pydantic_avro import instrumentation
+from pydantic_avro.codec import AvroCodec, Buffer
+
+ModelT = TypeVar("ModelT", bound="AvroBase")
+
+_codecs: Dict[Tuple[type, bool], AvroCodec] = {}
+
+
+class _MemoEntry(NamedTuple):
+    avro_type: dict
+    names: Set[str]
+    definitions: Dict[str, dict]
+
+
+class AvroSchemaMemo:
+    """
+    Named types shared between the avro schemas of several models
+
+    Passing the same memo to ``avro_schema`` for many models makes sure every nested model is only converted once.
+    By default every schema stays standalone, nested types are still defined inline but the converted definitions
+    are shared between the returned schemas. With ``deduplicate`` a nested type is only defined in the first schema
+    that uses it, later schemas refer to it by its full name.
+    """
+
+    def __init__(self, deduplicate: bool = False):
+        self.deduplicate = deduplicate
+        self._entries: Dict[str, _MemoEntry] = {}
+        # Full name per class name and pydantic definition, classes with the same name can be different types
+        self._full_names: Dict[Tuple[str, str], str] = {}
+        # Pydantic definition per full name, to detect different types with the same full name
+        self._definitions: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(class_name: str, definition: Optional[dict]) -> Tuple[str, str]:
+        return class_name, json.dumps(definition, sort_keys=True, default=str)
+
+    def _register(self, class_name: str, full_name: str, definition: dict):
+        key = self._key(class_name, definition)
+        if key in self._full_names:
+            return
+        if self._definitions.get(full_name, key[1]) != key[1]:
+            raise ValueError(f"Different types have the same full name {full_name}, use a namespace per module")
+        self._full_names[key] = full_name
+        self._definitions[full_name] = key[1]
+
+    def get(self, class_name: str, schema: dict, classes_seen: Set[str]) -> Union[str, dict, None]:
+        """Return the avro type of a definition if it is known and usable in the current schema"""
+        definitions = schema.get("definitions", {})
+        if self.deduplicate:
+            return self._full_names.get(self._key(class_name, definitions.get(class_name)))
+        entry = self._entries.get(class_name)
+        if entry is None or not entry.names.isdisjoint(classes_seen):
+            return None
+        if any(definitions.get(n) != d for n, d in entry.definitions.items()):
+            return None
+        classes_seen.update(entry.names)
+        return entry.avro_type
+
+    def add(
+        self, class_name: str, avro_type: dict, names: Set[str], references: List[str], schema: dict, namespace: str
+    ):
+        """Register a converted definition together with the names it defines and references"""
+        definitions = schema.get("definitions", {})
+        if self.deduplicate:
+            self._register(class_name, f"{namespace}.{avro_type['name']}", definitions[class_name])
+        elif names.issuperset(references):
+            # Only self-contained definitions can be inlined in other schemas
+            self._entries[class_name] = _MemoEntry(avro_type, names, {n: definitions[n] for n in names})
+
+    def add_model(self, schema: dict, namespace: str):
+        """Register a top level model so other models can refer to it"""
+        if self.deduplicate:
+            definition = {k: v for k, v in schema.items() if k != "definitions"}
+            self._register(schema["title"], f"{namespace}.{schema['title']}", definition)
+
 
 class AvroBase(BaseModel):
     """This is base pydantic class that will add some methods"""
 
     @classmethod
-    def avro_schema(cls, by_alias: bool = True, namespace: Optional[str] = None) -> dict:
+    def avro_schema(
+        cls, by_alias: bool = True, namespace: Optional[str] = None, memo: Optional[AvroSchemaMemo] = None
+    ) -> dict:
         """
         Return the avro schema for the pydantic class
 
         :param by_alias: generate the schemas using the aliases defined, if any
         :param namespace: Provide an optional namespace string to use in schema generation
+        :param memo: Optional memo to share named types between the schemas of multiple models
         :return: dict with the Avro Schema for the model
         """
-        schema = cls.schema(by_alias=by_alias)
+        if not instrumentation.enabled:
+            schema = cls.schema(by_alias=by_alias)
+        else:
+            instrumentation.record_cache(
+                "pydantic_schema", cls.__name__, any(key[0] == by_alias for key in cls.__schema_cache__)
+            )
+            start = time.perf_counter()
+            schema = cls.schema(by_alias=by_alias)
+            instrumentation.record("pydantic_schema", cls.__name__, start)
 
         if namespace is None:
             # default namespace will be based on title
             namespace = schema["title"]
 
-        return cls._avro_schema(schema, namespace)
+        if not instrumentation.enabled:
+            return cls._avro_schema(schema, namespace, memo)
+        start = time.perf_counter()
+        result = cls._avro_schema(schema, namespace, memo)
+        instrumentation.record("avro_schema", cls.__name__, start)
+        return result
+
+    @classmethod
+    def avro_codec(cls, by_alias: bool = True) -> AvroCodec:
+        """Return the binary avro codec of the model, it is compiled once per class"""
+        codec = _codecs.get((cls, by_alias))
+        if codec is None:
+            codec = _codecs[(cls, by_alias)] = AvroCodec(cls.avro_schema(by_alias=by_alias))
+        return codec
+
+    def avro_encode_into(self, buffer: Buffer, offset: int = 0) -> int:
+        """
+        Encode the model in avro binary format into a reusable buffer
+
+        :param buffer: bytearray, grown when too small, or writable memoryview
+        :param offset: position in the buffer to start writing
+        :return: number of bytes written
+        """
+        if not instrumentation.enabled:
+            return self.avro_codec().encode(self, buffer, offset)
+        start = time.perf_counter()
+        size = self.avro_codec().encode(self, buffer, offset)
+        instrumentation.record("encode", type(self).__name__, start, size)
+        return size
+
+    @classmethod
+    def avro_encode_many(cls, models: Iterable["AvroBase"], buffer: Buffer, offset: int = 0) -> List[int]:
+        """
+        Encode models after each other into a single buffer
+
+        :return: offsets of the encoded models, one more than the number of models, the last one is the end
+        """
+        if not instrumentation.enabled:
+            return cls.avro_codec().encode_many(models, buffer, offset)
+        start = time.perf_counter()
+        offsets = cls.avro_codec().encode_many(models, buffer, offset)
+        instrumentation.record("encode", cls.__name__, start, offsets[-1] - offsets[0])
+        return offsets
+
+    @classmethod
+    def avro_decode(cls: Type[ModelT], data: Union[bytes, Buffer], offset: int = 0) -> ModelT:
+        """Decode a model from avro binary data, use a memoryview to avoid copying slices of the data"""
+        if not instrumentation.enabled:
+            return cls.parse_obj(cls.avro_codec().decode(data, offset))
+        start = time.perf_counter()
+        model = cls.parse_obj(cls.avro_codec().decode(data, offset))
+        instrumentation.record("decode", cls.__name__, start)
+        return model
+
+    @classmethod
+    def avro_decode_many(cls: Type[ModelT], data: Union[bytes, Buffer], offsets: List[int]) -> List[ModelT]:
+        """Decode the models written by ``avro_encode_many``, given the offsets it returned"""
+        if not instrumentation.enabled:
+            return [cls.parse_obj(r) for r in cls.avro_codec().decode_many(data, offsets)]
+        start = time.perf_counter()
+        models = [cls.parse_obj(r) for r in cls.avro_codec().decode_many(data, offsets)]
+        instrumentation.record("decode", cls.__name__, start, offsets[-1] - offsets[0])
+        return models
 
     @staticmethod
-    def _avro_schema(schema: dict, namespace: str) -> dict:
+    def _avro_schema(schema: dict, namespace: str, memo: Optional[AvroSchemaMemo] = None) -> dict:
         """Return the avro schema for the given pydantic schema"""
 
-        classes_seen = set()
+        classes_seen: Set[str] = set()
+        # Names that are referenced instead of defined, needed to know if a definition can be reused by the memo
+        references: List[str] = []
 
         def get_definition(ref: str, schema: dict):
             """Reading definition of base schema for nested structs"""
@@ -37,6 +189,39 @@ class AvroBase(BaseModel):
                 raise RuntimeError(f"Definition {id} does not exist")
             return d
 
+        def get_named_type(class_name: str, ref: str) -> Union[str, dict]:
+            """Returns the definition of an enum or nested struct, or its full name when defined in another schema"""
+            if memo is not None:
+                cached = memo.get(class_name, schema, classes_seen)
+                if instrumentation.enabled:
+                    instrumentation.record_cache("named_types", class_name, cached is not None)
+                if cached is not None:
+                    return cached
+            d = get_definition(ref, schema)
+            seen_before = set(classes_seen)
+            references_start = len(references)
+            named_type: dict
+            if "enum" in d:
+                named_type = {
+                    "type": "enum",
+                    "symbols": [str(v) for v in d["enum"]],
+                    "name": d["title"],
+                }
+            else:
+                named_type = {
+                    "type": "record",
+                    "fields": get_fields(d),
+                    # Name of the struct should be unique true the complete schema
+                    # Because of this the path in the schema is tracked and used as name for a nested struct/array
+                    "name": class_name,
+                }
+            classes_seen.add(class_name)
+            if memo is not None:
+                memo.add(
+                    class_name, named_type, classes_seen - seen_before, references[references_start:], schema, namespace
+                )
+            return named_type
+
         def get_type(value: dict) -> dict:
             """Returns a type of a single field"""
             t = value.get("type")
@@ -54,23 +239,9 @@ class AvroBase(BaseModel):
                 class_name = r.replace("#/definitions/", "")
                 if class_name in classes_seen:
                     avro_type_dict["type"] = class_name
+                    references.append(class_name)
                 else:
-                    d = get_definition(r, schema)
-                    if "enum" in d:
-                        avro_type_dict["type"] = {
-                            "type": "enum",
-                            "symbols": [str(v) for v in d["enum"]],
-                            "name": d["title"],
-                        }
-                    else:
-                        avro_type_dict["type"] = {
-                            "type": "record",
-                            "fields": get_fields(d),
-                            # Name of the struct should be unique true the complete schema
-                            # Because of this the path in the schema is tracked and used as name for a nested struct/array
-                            "name": class_name,
-                        }
-                    classes_seen.add(class_name)
+                    avro_type_dict["type"] = get_named_type(class_name, r)
             elif t == "array":
                 items = value.get("items")
                 tn = get_type(items)
@@ -147,5 +318,7 @@ class AvroBase(BaseModel):
             return fields
 
         fields = get_fields(schema)
+        if memo is not None:
+            memo.add_model(schema, namespace)
 
         return {"type": "record", "namespace": namespace, "name": schema["title"], "fields": fields}
@@ -0,0 +1,532 @@
+"""
+Binary Avro encoding and decoding into caller supplied buffers
+
+An ``AvroCodec`` compiles an avro schema once into encoder and decoder functions. Encoding writes directly into a
+``bytearray`` or writable ``memoryview`` at a given offset, so a single buffer can be reused for every message. Decoding
+reads from ``bytes``, ``bytearray`` or ``memoryview`` without copying the input, strings are decoded straight from a
+``memoryview`` slice.
+"""
+
+import struct
+from datetime import date, datetime, time, timedelta, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
+from uuid import UUID
+
+from pydantic import BaseModel
+
+Buffer = Union[bytearray, memoryview]
+Encoder = Callable[[Buffer, int, Any], int]
+Decoder = Callable[[Any, int], Tuple[Any, int]]
+
+PRIMITIVES = {"null", "boolean", "int", "long", "float", "double", "bytes", "string"}
+
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _grow(buf: Buffer, size: int):
+    """Make sure the buffer has at least ``size`` bytes, only a bytearray can grow"""
+    if size <= len(buf):
+        return
+    if not isinstance(buf, bytearray):
+        raise BufferError(f"Buffer of {len(buf)} bytes is too small, at least {size} bytes needed")
+    buf.extend(bytes(max(size - len(buf), len(buf))))
+
+
+def _write_long(buf: Buffer, pos: int, n: int) -> int:
+    n = (n << 1) ^ (n >> 63)
+    if pos + 10 > len(buf):
+        # Only reserve the exact size near the end, a memoryview can be exactly as large as the message
+        _grow(buf, pos + max(1, (n.bit_length() + 6) // 7))
+    while n > 0x7F:
+        buf[pos] = (n & 0x7F) | 0x80
+        n >>= 7
+        pos += 1
+    buf[pos] = n
+    return pos + 1
+
+
+def _read_long(data: Any, pos: int) -> Tuple[int, int]:
+    b = data[pos]
+    n = b & 0x7F
+    shift = 7
+    pos += 1
+    while b & 0x80:
+        b = data[pos]
+        n |= (b & 0x7F) << shift
+        shift += 7
+        pos += 1
+    return (n >> 1) ^ -(n & 1), pos
+
+
+def _write_bytes(buf: Buffer, pos: int, value: bytes) -> int:
+    size = len(value)
+    pos = _write_long(buf, pos, size)
+    if pos + size > len(buf):
+        _grow(buf, pos + size)
+    buf[pos : pos + size] = value
+    return pos + size
+
+
+def _write_null(buf: Buffer, pos: int, value: None) -> int:
+    return pos
+
+
+def _read_null(data: Any, pos: int) -> Tuple[None, int]:
+    return None, pos
+
+
+def _write_boolean(buf: Buffer, pos: int, value: bool) -> int:
+    if pos + 1 > len(buf):
+        _grow(buf, pos + 1)
+    buf[pos] = 1 if value else 0
+    return pos + 1
+
+
+def _read_boolean(data: Any, pos: int) -> Tuple[bool, int]:
+    return data[pos] == 1, pos + 1
+
+
+def _write_float(buf: Buffer, pos: int, value: float) -> int:
+    if pos + 4 > len(buf):
+        _grow(buf, pos + 4)
+    _FLOAT.pack_into(buf, pos, value)
+    return pos + 4
+
+
+def _read_float(data: Any, pos: int) -> Tuple[float, int]:
+    return _FLOAT.unpack_from(data, pos)[0], pos + 4
+
+
+def _write_double(buf: Buffer, pos: int, value: float) -> int:
+    if pos + 8 > len(buf):
+        _grow(buf, pos + 8)
+    _DOUBLE.pack_into(buf, pos, value)
+    return pos + 8
+
+
+def _read_double(data: Any, pos: int) -> Tuple[float, int]:
+    return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+
+
+def _write_string(buf: Buffer, pos: int, value: str) -> int:
+    if isinstance(value, Enum):
+        value = value.value
+    return _write_bytes(buf, pos, value.encode())
+
+
+def _read_string(data: Any, pos: int) -> Tuple[str, int]:
+    size, pos = _read_long(data, pos)
+    return str(data[pos : pos + size], "utf-8"), pos + size
+
+
+def _read_bytes(data: Any, pos: int) -> Tuple[bytes, int]:
+    size, pos = _read_long(data, pos)
+    return bytes(data[pos : pos + size]), pos + size
+
+
+_PRIMITIVE_ENCODERS: Dict[str, Encoder] = {
+    "null": _write_null,
+    "boolean": _write_boolean,
+    "int": _write_long,
+    "long": _write_long,
+    "float": _write_float,
+    "double": _write_double,
+    "bytes": _write_bytes,
+    "string": _write_string,
+}
+
+_PRIMITIVE_DECODERS: Dict[str, Decoder] = {
+    "null": _read_null,
+    "boolean": _read_boolean,
+    "int": _read_long,
+    "long": _read_long,
+    "float": _read_float,
+    "double": _read_double,
+    "bytes": _read_bytes,
+    "string": _read_string,
+}
+
+
+def _to_micros(value: datetime) -> int:
+    delta = value - (_EPOCH if value.tzinfo is not None else _EPOCH_NAIVE)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _time_to_micros(value: time) -> int:
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+
+def _micros_to_time(n: int) -> time:
+    seconds, micros = divmod(n, 1_000_000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return time(hours, minutes, seconds, micros)
+
+
+# Conversion of logical types: (python to avro, avro to python)
+_LOGICAL_TYPES: Dict[str, Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = {
+    "timestamp-micros": (_to_micros, lambda n: _EPOCH + timedelta(microseconds=n)),
+    "timestamp-millis": (lambda v: _to_micros(v) // 1000, lambda n: _EPOCH + timedelta(milliseconds=n)),
+    "date": (lambda v: v.toordinal() - _EPOCH_ORDINAL, lambda n: date.fromordinal(n + _EPOCH_ORDINAL)),
+    "time-micros": (_time_to_micros, _micros_to_time),
+    "time-millis": (lambda v: _time_to_micros(v) // 1000, lambda n: _micros_to_time(n * 1000)),
+    "uuid": (str, UUID),
+}
+
+# Python types accepted for each avro type, used to resolve the branch of a union
+_UNION_TYPES: Dict[str, Tuple[type, ...]] = {
+    "null": (type(None),),
+    "boolean": (bool,),
+    "int": (int,),
+    "long": (int,),
+    "float": (float, int),
+    "double": (float, int),
+    "bytes": (bytes, bytearray, memoryview),
+    "string": (str,),
+    "enum": (str,),
+    "array": (list, tuple),
+    "map": (dict,),
+    "record": (dict, BaseModel),
+    "timestamp-micros": (datetime,),
+    "timestamp-millis": (datetime,),
+    "date": (date,),
+    "time-micros": (time,),
+    "time-millis": (time,),
+    "uuid": (UUID, str),
+}
+
+
+def _model_attributes(model: Type[BaseModel], names: List[str]) -> List[str]:
+    """Return the attribute names of a pydantic model for the given avro field names, which can be aliases"""
+    by_alias = {f.alias: f.name for f in model.__fields__.values()}
+    attributes = []
+    for name in names:
+        if name in by_alias:
+            attributes.append(by_alias[name])
+        elif name in model.__fields__:
+            attributes.append(name)
+        else:
+            raise ValueError(f"Field {name} does not exist in {model.__name__}")
+    return attributes
+
+
+def _enum_matcher(schema: dict) -> Callable[[Any], bool]:
+    """Return a check if a value is a symbol of an enum branch of a union"""
+    symbols = set(schema["symbols"])
+
+    def matches(value: Any) -> bool:
+        return (value.value if isinstance(value, Enum) else value) in symbols
+
+    return matches
+
+
+def _record_matcher(schema: dict, record_names: Set[str]) -> Callable[[Any], bool]:
+    """
+    Return a check if a value belongs to a record branch of a union with several records
+
+    Models match the record with the name of their class. Dicts, and models of a class without a record of that name,
+    match the first record that has all their keys and of which every field without a default is present.
+    """
+    name = schema["name"].rpartition(".")[2]
+    fields = {f["name"] for f in schema["fields"]}
+    required = {f["name"] for f in schema["fields"] if "default" not in f}
+
+    def matches(value: Any) -> bool:
+        if isinstance(value, BaseModel):
+            class_name = type(value).__name__
+            if class_name in record_names:
+                return class_name == name
+            keys = {f.alias for f in type(value).__fields__.values()}
+        else:
+            keys = set(value)
+        return required <= keys <= fields
+
+    return matches
+
+
+class AvroCodec:
+    """Binary avro encoder and decoder of a single avro schema"""
+
+    def __init__(self, schema: Union[dict, str]):
+        self.schema = schema
+        self._encoders: Dict[str, Encoder] = {}
+        self._decoders: Dict[str, Decoder] = {}
+        # Schema of every named type, used to resolve unions
+        self._named: Dict[str, dict] = {}
+        self._encode, self._decode = self._compile_type(schema, "")
+
+    def _compile_type(self, schema: Union[dict, list, str], namespace: str) -> Tuple[Encoder, Decoder]:
+        if isinstance(schema, str):
+            if schema in PRIMITIVES:
+                return _PRIMITIVE_ENCODERS[schema], _PRIMITIVE_DECODERS[schema]
+            name = self._full_name(schema, namespace)
+            return self._encoders[name], self._decoders[name]
+        if isinstance(schema, list):
+            return self._compile_union(schema, namespace)
+
+        t = schema["type"]
+        logical = schema.get("logicalType")
+        if logical in _LOGICAL_TYPES:
+            to_avro, from_avro = _LOGICAL_TYPES[logical]
+            enc, dec = self._compile_type(t, namespace)
+
+            def encode_logical(buf: Buffer, pos: int, value: Any) -> int:
+                return enc(buf, pos, to_avro(value))
+
+            def decode_logical(data: Any, pos: int) -> Tuple[Any, int]:
+                value, pos = dec(data, pos)
+                return from_avro(value), pos
+
+            return encode_logical, decode_logical
+        # Unknown logical types are ignored and encoded as the underlying type
+        if t in PRIMITIVES:
+            return self._compile_type(t, namespace)
+        if t == "record":
+            return self._compile_record(schema, namespace)
+        if t == "enum":
+            return self._compile_enum(schema, namespace)
+        if t == "array":
+            return self._compile_array(schema, namespace)
+        if t == "map":
+            return self._compile_map(schema, namespace)
+        raise NotImplementedError(f"Type {t} not supported yet")
+
+    def _full_name(self, name: str, namespace: str) -> str:
+        """Return the full name of a reference to an already compiled named type"""
+        for full_name in (f"{namespace}.{name}", name):
+            if full_name in self._encoders:
+                return full_name
+        raise ValueError(f"Unknown type {name}")
+
+    def _register(self, schema: dict, namespace: str, encoder: Encoder, decoder: Decoder) -> str:
+        """Register a named type under its full name, returns the namespace for nested types"""
+        name = schema["name"]
+        namespace = schema.get("namespace", namespace)
+        full_name = name if "." in name or not namespace else f"{namespace}.{name}"
+        self._encoders[full_name] = encoder
+        self._decoders[full_name] = decoder
+        self._named[full_name] = schema
+        return full_name.rpartition(".")[0]
+
+    def _compile_record(self, schema: dict, namespace: str) -> Tuple[Encoder, Decoder]:
+        names: List[str] = []
+        defaults: List[Any] = []
+        encoders: List[Encoder] = []
+        decoders: List[Decoder] = []
+        attributes: Dict[type, List[str]] = {}
+
+        def encode_record(buf: Buffer, pos: int, value: Any) -> int:
+            if isinstance(value, dict):
+                for name, default, enc in zip(names, defaults, encoders):
+                    pos = enc(buf, pos, value.get(name, default))
+                return pos
+            model_attributes = attributes.get(type(value))
+            if model_attributes is None:
+                model_attributes = attributes[type(value)] = _model_attributes(type(value), names)
+            values = value.__dict__
+            for attribute, enc in zip(model_attributes, encoders):
+                pos = enc(buf, pos, values[attribute])
+            return pos
+
+        def decode_record(data: Any, pos: int) -> Tuple[dict, int]:
+            record = {}
+            for name, dec in zip(names, decoders):
+                record[name], pos = dec(data, pos)
+            return record, pos
+
+        # Registered before compiling the fields, so fields can refer to this record
+        namespace = self._register(schema, namespace, encode_record, decode_record)
+        for field in schema["fields"]:
+            enc, dec = self._compile_type(field["type"], namespace)
+            names.append(field["name"])
+            defaults.append(field.get("default"))
+            encoders.append(enc)
+            decoders.append(dec)
+        return encode_record, decode_record
+
+    def _compile_enum(self, schema: dict, namespace: str) -> Tuple[Encoder, Decoder]:
+        symbols: List[str] = list(schema["symbols"])
+        indexes: Dict[str, int] = {s: i for i, s in enumerate(symbols)}
+
+        def encode_enum(buf: Buffer, pos: int, value: Any) -> int:
+            # Enum members hash by name, so look them up by their value
+            index = indexes.get(value if type(value) is str else value.value)
+            if index is None:
+                raise ValueError(f"{value!r} is not a symbol of enum {schema['name']}")
+            return _write_long(buf, pos, index)
+
+        def decode_enum(data: Any, pos: int) -> Tuple[str, int]:
+            index, pos = _read_long(data, pos)
+            return symbols[index], pos
+
+        self._register(schema, namespace, encode_enum, decode_enum)
+        return encode_enum, decode_enum
+
+    def _compile_array(self, schema: dict, namespace: str) -> Tuple[Encoder, Decoder]:
+        enc, dec = self._compile_type(schema["items"], namespace)
+
+        def encode_array(buf: Buffer, pos: int, value: Any) -> int:
+            if value:
+                pos = _write_long(buf, pos, len(value))
+                for item in value:
+                    pos = enc(buf, pos, item)
+            return _write_long(buf, pos, 0)
+
+        def decode_array(data: Any, pos: int) -> Tuple[list, int]:
+            items = []
+            count, pos = _read_long(data, pos)
+            while count != 0:
+                if count < 0:
+                    # A negative count is followed by the size of the block in bytes
+                    count = -count
+                    _, pos = _read_long(data, pos)
+                for _ in range(count):
+                    item, pos = dec(data, pos)
+                    items.append(item)
+                count, pos = _read_long(data, pos)
+            return items, pos
+
+        return encode_array, decode_array
+
+    def _compile_map(self, schema: dict, namespace: str) -> Tuple[Encoder, Decoder]:
+        enc, dec = self._compile_type(schema["values"], namespace)
+
+        def encode_map(buf: Buffer, pos: int, value: Any) -> int:
+            if value:
+                pos = _write_long(buf, pos, len(value))
+                for k, v in value.items():
+                    pos = _write_string(buf, pos, k)
+                    pos = enc(buf, pos, v)
+            return _write_long(buf, pos, 0)
+
+        def decode_map(data: Any, pos: int) -> Tuple[dict, int]:
+            values = {}
+            count, pos = _read_long(data, pos)
+            while count != 0:
+                if count < 0:
+                    count = -count
+                    _, pos = _read_long(data, pos)
+                for _ in range(count):
+                    k, pos = _read_string(data, pos)
+                    values[k], pos = dec(data, pos)
+                count, pos = _read_long(data, pos)
+            return values, pos
+
+        return encode_map, decode_map
+
+    def _compile_union(self, schema: list, namespace: str) -> Tuple[Encoder, Decoder]:
+        if len(schema) == 2 and "null" in schema:
+            return self._compile_optional(schema, namespace)
+
+        named = [
+            self._named[self._full_name(b, namespace)] if isinstance(b, str) and b not in PRIMITIVES else b
+            for b in schema
+        ]
+        record_names = {b["name"].rpartition(".")[2] for b in named if isinstance(b, dict) and b["type"] == "record"}
+        branches: List[Tuple[Tuple[type, ...], Encoder, Optional[Callable[[Any], bool]]]] = []
+        decoders: List[Decoder] = []
+        for branch, definition in zip(schema, named):
+            enc, dec = self._compile_type(branch, namespace)
+            if isinstance(definition, str):
+                key = definition
+            else:
+                key = definition.get("logicalType") or definition["type"]
+            matches = None
+            if key == "enum":
+                matches = _enum_matcher(definition)
+            elif key == "record" and len(record_names) > 1:
+                matches = _record_matcher(definition, record_names)
+            branches.append((_UNION_TYPES.get(key, (object,)), enc, matches))
+            decoders.append(dec)
+        # Branch index and encoder per python type, filled on the first value of each type whose branch does not
+        # depend on the value itself
+        dispatch: Dict[type, Tuple[int, Encoder]] = {}
+
+        def resolve(value: Any) -> Tuple[int, Encoder]:
+            cacheable = True
+            for index, (types, enc, matches) in enumerate(branches):
+                if isinstance(value, types) and not (isinstance(value, bool) and bool not in types):
+                    if matches is not None:
+                        # Models are matched by class, which is the same for every value of the type
+                        cacheable = cacheable and isinstance(value, BaseModel)
+                        if not matches(value):
+                            continue
+                    if cacheable:
+                        dispatch[type(value)] = (index, enc)
+                    return index, enc
+            raise ValueError(f"Value {value!r} does not match any type of union {schema}")
+
+        def encode_union(buf: Buffer, pos: int, value: Any) -> int:
+            branch = dispatch.get(type(value))
+            index, enc = branch if branch is not None else resolve(value)
+            return enc(buf, _write_long(buf, pos, index), value)
+
+        def decode_union(data: Any, pos: int) -> Tuple[Any, int]:
+            index, pos = _read_long(data, pos)
+            return decoders[index](data, pos)
+
+        return encode_union, decode_union
+
+    def _compile_optional(self, schema: list, namespace: str) -> Tuple[Encoder, Decoder]:
+        """Union of null and a single type, the index is a single byte and needs no type checks"""
+        null_index = schema.index("null")
+        enc, dec = self._compile_type(schema[1 - null_index], namespace)
+        # Zig-zag encoded branch indexes 0 and 1
+        null_byte, value_byte = (0, 2) if null_index == 0 else (2, 0)
+
+        def encode_optional(buf: Buffer, pos: int, value: Any) -> int:
+            if pos + 1 > len(buf):
+                _grow(buf, pos + 1)
+            if value is None:
+                buf[pos] = null_byte
+                return pos + 1
+            buf[pos] = value_byte
+            return enc(buf, pos + 1, value)
+
+        def decode_optional(data: Any, pos: int) -> Tuple[Any, int]:
+            if data[pos] == null_byte:
+                return None, pos + 1
+            return dec(data, pos + 1)
+
+        return encode_optional, decode_optional
+
+    def encode(self, value: Any, buffer: Buffer, offset: int = 0) -> int:
+        """
+        Encode a single value into a buffer
+
+        A bytearray grows when it is too small, a memoryview raises a BufferError. Bytes in the buffer after the
+        written part are left as they are, so the same buffer can be reused for every message.
+
+        :param value: dict or pydantic model matching the schema
+        :param buffer: bytearray or writable memoryview to write in
+        :param offset: position in the buffer to start writing
+        :return: number of bytes written
+        """
+        return self._encode(buffer, offset, value) - offset
+
+    def encode_many(self, values: Iterable[Any], buffer: Buffer, offset: int = 0) -> List[int]:
+        """
+        Encode values after each other into a single buffer
+
+        :return: offsets of the encoded values, one more than the number of values, the last one is the end
+        """
+        offsets = [offset]
+        pos = offset
+        for value in values:
+            pos = self._encode(buffer, pos, value)
+            offsets.append(pos)
+        return offsets
+
+    def decode(self, data: Union[bytes, Buffer], offset: int = 0) -> Any:
+        """Decode a single value starting at ``offset``"""
+        return self._decode(data, offset)[0]
+
+    def decode_many(self, data: Union[bytes, Buffer], offsets: List[int]) -> List[Any]:
+        """Decode the values written by ``encode_many``, given the offsets it returned"""
+        decode = self._decode
+        return [decode(data, offset)[0] for offset in offsets[:-1]]
@@ -0,0 +1,357 @@
+"""
+Checking compatibility between versions of avro schemas
+
+Schemas are normalized once: named types are collected by full name and every named type gets a fingerprint of its
+content, including the content of the types it refers to. The result of comparing two named types is memoized by the
+pair of fingerprints, so nested records shared between many models are only checked once per ``CompatibilityChecker``.
+Results follow the avro schema resolution rules, with the reader schema reading data written with the writer schema.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from pydantic_avro import instrumentation
+from pydantic_avro.codec import PRIMITIVES
+
+Node = Union[str, list, dict]
+
+# Writer types that can be read as each reader type
+_PROMOTIONS: Dict[str, Set[str]] = {
+    "long": {"int"},
+    "float": {"int", "long"},
+    "double": {"int", "long", "float"},
+    "string": {"bytes"},
+    "bytes": {"string"},
+}
+
+MODES = {"backward", "forward", "full"}
+
+
+class Incompatibility(NamedTuple):
+    """A single reason why data of the writer schema can not be read with the reader schema"""
+
+    # Dotted path of the field, "[]" for items of an array and "{}" for values of a map
+    path: str
+    kind: str
+    message: str
+
+    def prefixed(self, path: str) -> "Incompatibility":
+        return self._replace(path=_join(path, self.path))
+
+
+class CompatibilityReport(NamedTuple):
+    """Result of checking one model against one of its previous versions"""
+
+    model: str
+    # Index of the previous version in the sequence of previous versions
+    version: int
+    # "backward" when the new schema reads data of the previous version, "forward" for the other way around
+    direction: str
+    incompatibilities: List[Incompatibility]
+
+    @property
+    def compatible(self) -> bool:
+        return not self.incompatibilities
+
+
+def _join(path: str, sub: str) -> str:
+    if not path:
+        return sub
+    if not sub or sub.startswith("["):
+        return path + sub
+    return f"{path}.{sub}"
+
+
+class NormalizedSchema:
+    """An avro schema with all named types collected by full name and fingerprinted"""
+
+    def __init__(self, schema: Node):
+        self.named: Dict[str, dict] = {}
+        self.root = self._normalize(schema, "")
+        self._fingerprints: Dict[str, str] = {}
+
+    def _normalize(self, schema: Node, namespace: str) -> Node:
+        """Return the schema with logical types, docs and defaults of types removed, named types become references"""
+        if isinstance(schema, str):
+            if schema in PRIMITIVES:
+                return schema
+            for name in (f"{namespace}.{schema}", schema):
+                if name in self.named:
+                    return name
+            raise ValueError(f"Unknown type {schema}")
+        if isinstance(schema, list):
+            return [self._normalize(s, namespace) for s in schema]
+
+        t = schema["type"]
+        if t in PRIMITIVES or isinstance(t, (dict, list)):
+            return self._normalize(t, namespace)
+        if t == "array":
+            return {"type": "array", "items": self._normalize(schema["items"], namespace)}
+        if t == "map":
+            return {"type": "map", "values": self._normalize(schema["values"], namespace)}
+        if t not in ("record", "error", "enum", "fixed"):
+            # A reference to a named type written as {"type": "Name"}
+            return self._normalize(t, namespace)
+
+        name = schema["name"]
+        namespace = schema.get("namespace", namespace)
+        full_name = name if "." in name or not namespace else f"{namespace}.{name}"
+        namespace = full_name.rpartition(".")[0]
+        definition: Dict[str, Any] = {"type": "record" if t == "error" else t, "name": full_name}
+        if "aliases" in schema:
+            definition["aliases"] = sorted(schema["aliases"])
+        self.named[full_name] = definition
+        if t == "enum":
+            definition["symbols"] = list(schema["symbols"])
+            if "default" in schema:
+                definition["default"] = schema["default"]
+        elif t == "fixed":
+            definition["size"] = schema["size"]
+        else:
+            fields = []
+            for field in schema["fields"]:
+                normalized = {"name": field["name"], "type": self._normalize(field["type"], namespace)}
+                if "default" in field:
+                    normalized["default"] = field["default"]
+                if "aliases" in field:
+                    normalized["aliases"] = sorted(field["aliases"])
+                fields.append(normalized)
+            definition["fields"] = fields
+        return full_name
+
+    def fingerprint(self, node: Optional[Node] = None) -> str:
+        """Return the fingerprint of a (sub) schema, by default of the whole schema"""
+        node = self.root if node is None else node
+        if isinstance(node, str) and node in self.named:
+            return self._named_fingerprint(node, set(), [])
+        return self._hash(self._canonical(node, set(), []))
+
+    @staticmethod
+    def _hash(canonical: Any) -> str:
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:32]
+
+    def _named_fingerprint(self, name: str, stack: Set[str], cycles: List[str]) -> str:
+        fingerprint = self._fingerprints.get(name)
+        if fingerprint is None:
+            start = len(cycles)
+            fingerprint = self._hash(self._canonical(self.named[name], stack | {name}, cycles))
+            # A type in a cycle with an enclosing type has a fingerprint that depends on where it is used
+            if all(c == name for c in cycles[start:]):
+                self._fingerprints[name] = fingerprint
+        return fingerprint
+
+    def _canonical(self, node: Any, stack: Set[str], cycles: List[str]) -> Any:
+        """The node with references to named types replaced by their fingerprint, or their name in a cycle"""
+        if isinstance(node, str):
+            if node not in self.named:
+                return node
+            if node in stack:
+                cycles.append(node)
+                return {"cycle": node}
+            return {"ref": self._named_fingerprint(node, stack, cycles)}
+        if isinstance(node, list):
+            return [self._canonical(n, stack, cycles) for n in node]
+        result = {}
+        for key, value in node.items():
+            if key in ("items", "values") or (key == "type" and node.get("type") not in ("record", "enum", "fixed")):
+                result[key] = self._canonical(value, stack, cycles)
+            elif key == "fields":
+                result[key] = [{**f, "type": self._canonical(f["type"], stack, cycles)} for f in value]
+            else:
+                result[key] = value
+        return result
+
+
+class CompatibilityChecker:
+    """
+    Compatibility checks with results memoized per pair of named types
+
+    Reuse a single checker for many checks, results of shared nested types are kept between checks.
+    """
+
+    def __init__(self):
+        self._memo: Dict[Tuple[str, str], Tuple[Incompatibility, ...]] = {}
+        self._in_progress: Set[Tuple[str, str]] = set()
+        # Pairs assumed compatible because they were in progress, results depending on them are not memoized
+        self._assumed: List[Tuple[str, str]] = []
+
+    def check(
+        self, reader: Union[Node, NormalizedSchema], writer: Union[Node, NormalizedSchema]
+    ) -> List[Incompatibility]:
+        """Return the reasons why data written with the writer schema can not be read with the reader schema"""
+        r = reader if isinstance(reader, NormalizedSchema) else NormalizedSchema(reader)
+        w = writer if isinstance(writer, NormalizedSchema) else NormalizedSchema(writer)
+        return self._check(r, r.root, w, w.root)
+
+    def _check(self, r: NormalizedSchema, rn: Node, w: NormalizedSchema, wn: Node) -> List[Incompatibility]:
+        if isinstance(wn, list):
+            issues = []
+            for branch in wn:
+                if isinstance(rn, list):
+                    issues.extend(self._check_branch(r, rn, w, branch, "missing_union_branch", "is not in the union"))
+                else:
+                    issues.extend(self._check(r, rn, w, branch))
+            return issues
+        if isinstance(rn, list):
+            return self._check_branch(r, rn, w, wn, "type_mismatch", f"is not in union {_describe(r, rn)}")
+
+        r_named = r.named.get(rn) if isinstance(rn, str) else None
+        w_named = w.named.get(wn) if isinstance(wn, str) else None
+        if r_named is not None and w_named is not None and r_named["type"] == w_named["type"]:
+            return self._check_named(r, r_named, w, w_named)
+        if isinstance(rn, str) and isinstance(wn, str) and r_named is None and w_named is None:
+            if rn == wn or wn in _PROMOTIONS.get(rn, ()):
+                return []
+        elif isinstance(rn, dict) and isinstance(wn, dict) and rn["type"] == wn["type"]:
+            key = "items" if rn["type"] == "array" else "values"
+            sub = "[]" if key == "items" else "{}"
+            return [i.prefixed(sub) for i in self._check(r, rn[key], w, wn[key])]
+        return [Incompatibility("", "type_mismatch", f"{_describe(w, wn)} can not be read as {_describe(r, rn)}")]
+
+    def _check_branch(
+        self, r: NormalizedSchema, rn: list, w: NormalizedSchema, wn: Node, kind: str, message: str
+    ) -> List[Incompatibility]:
+        """Check a writer type against a reader union, the changes of a matching branch are reported per field"""
+        if any(not self._check(r, rb, w, wn) for rb in rn):
+            return []
+        # The branch of the same named type or container, like the record of an Optional model
+        matching = next((rb for rb in rn if _same_type(r, rb, w, wn)), None)
+        if matching is not None:
+            return self._check(r, matching, w, wn)
+        return [Incompatibility("", kind, f"{_describe(w, wn)} {message}")]
+
+    def _check_named(self, r: NormalizedSchema, rd: dict, w: NormalizedSchema, wd: dict) -> List[Incompatibility]:
+        key = (r.fingerprint(rd["name"]), w.fingerprint(wd["name"]))
+        cached = self._memo.get(key)
+        if instrumentation.enabled:
+            instrumentation.record_cache("compatibility", rd["name"], cached is not None)
+        if cached is not None:
+            return list(cached)
+        if key in self._in_progress:
+            # Recursive type, the pair is assumed compatible while it is being checked
+            self._assumed.append(key)
+            return []
+        start = len(self._assumed)
+        self._in_progress.add(key)
+        try:
+            issues = self._compare_named(r, rd, w, wd)
+        finally:
+            self._in_progress.discard(key)
+        # Assumptions about this pair itself are resolved now, others belong to a pair that is still in progress
+        self._assumed[start:] = [a for a in self._assumed[start:] if a != key]
+        if len(self._assumed) == start:
+            self._memo[key] = tuple(issues)
+        return issues
+
+    def _compare_named(self, r: NormalizedSchema, rd: dict, w: NormalizedSchema, wd: dict) -> List[Incompatibility]:
+        r_name, w_name = rd["name"].rpartition(".")[2], wd["name"].rpartition(".")[2]
+        aliases = {a.rpartition(".")[2] for a in rd.get("aliases", [])}
+        if r_name != w_name and w_name not in aliases:
+            return [Incompatibility("", "name_mismatch", f"{wd['name']} can not be read as {rd['name']}")]
+
+        if rd["type"] == "enum":
+            missing = [s for s in wd["symbols"] if s not in rd["symbols"]]
+            if missing and "default" not in rd:
+                return [Incompatibility("", "missing_symbols", f"Symbols {', '.join(missing)} are not in {rd['name']}")]
+            return []
+        if rd["type"] == "fixed":
+            if rd["size"] != wd["size"]:
+                return [Incompatibility("", "size_mismatch", f"Size {wd['size']} can not be read as size {rd['size']}")]
+            return []
+
+        issues = []
+        writer_fields = {f["name"]: f for f in wd["fields"]}
+        for field in rd["fields"]:
+            writer_field = writer_fields.get(field["name"])
+            if writer_field is None:
+                writer_field = next((writer_fields[a] for a in field.get("aliases", []) if a in writer_fields), None)
+            if writer_field is None:
+                if "default" not in field:
+                    issues.append(
+                        Incompatibility(field["name"], "missing_default", "Field is not written and has no default")
+                    )
+                continue
+            issues.extend(i.prefixed(field["name"]) for i in self._check(r, field["type"], w, writer_field["type"]))
+        return issues
+
+
+def _same_type(r: NormalizedSchema, rn: Node, w: NormalizedSchema, wn: Node) -> bool:
+    """Return if a reader and writer node are the same named type, or both an array or both a map"""
+    if isinstance(rn, dict) and isinstance(wn, dict):
+        return rn["type"] == wn["type"]
+    rd = r.named.get(rn) if isinstance(rn, str) else None
+    wd = w.named.get(wn) if isinstance(wn, str) else None
+    if rd is None or wd is None or rd["type"] != wd["type"]:
+        return False
+    name = wd["name"].rpartition(".")[2]
+    return name == rd["name"].rpartition(".")[2] or name in {a.rpartition(".")[2] for a in rd.get("aliases", [])}
+
+
+def _describe(schema: NormalizedSchema, node: Node) -> str:
+    if isinstance(node, list):
+        return "[" + ", ".join(_describe(schema, n) for n in node) + "]"
+    if isinstance(node, dict):
+        if node["type"] == "array":
+            return f"array<{_describe(schema, node['items'])}>"
+        return f"map<{_describe(schema, node['values'])}>"
+    return node
+
+
+def check_compatibility(reader: Node, writer: Node) -> List[Incompatibility]:
+    """Return the reasons why data written with the writer schema can not be read with the reader schema"""
+    return CompatibilityChecker().check(reader, writer)
+
+
+# Checker of a worker process, kept between tasks so its memo is reused
+_worker_checker: Optional[CompatibilityChecker] = None
+
+
+def _check_model(task: Tuple[str, Node, Sequence[Node], str]) -> List[CompatibilityReport]:
+    global _worker_checker
+    if _worker_checker is None:
+        _worker_checker = CompatibilityChecker()
+    checker = _worker_checker
+
+    name, schema, previous, mode = task
+    new = NormalizedSchema(schema)
+    reports = []
+    for version, old_schema in enumerate(previous):
+        old = NormalizedSchema(old_schema)
+        if mode in ("backward", "full"):
+            reports.append(CompatibilityReport(name, version, "backward", checker.check(new, old)))
+        if mode in ("forward", "full"):
+            reports.append(CompatibilityReport(name, version, "forward", checker.check(old, new)))
+    return reports
+
+
+def check_models(
+    schemas: Dict[str, Node],
+    previous: Dict[str, Sequence[Node]],
+    mode: str = "backward",
+    processes: Optional[int] = None,
+) -> Dict[str, List[CompatibilityReport]]:
+    """
+    Check the schemas of many models against their previous versions
+
+    :param schemas: new schema per model name, for example the result of ``models_to_avsc``
+    :param previous: previous versions of the schema per model name, models without previous versions are skipped
+    :param mode: "backward", the new schema can read old data, "forward", old schemas can read new data, or "full"
+    :param processes: number of worker processes, default the number of cpus, 1 to check in the current process
+    :return: reports per model name, one per previous version and direction
+    """
+    if mode not in MODES:
+        raise ValueError(f"Mode {mode} not supported, use one of {', '.join(sorted(MODES))}")
+    tasks = [(name, schema, previous[name], mode) for name, schema in schemas.items() if previous.get(name)]
+    processes = processes or os.cpu_count() or 1
+
+    results: Iterable[List[CompatibilityReport]]
+    if processes <= 1 or len(tasks) <= 1:
+        results = map(_check_model, tasks)
+        return {task[0]: reports for task, reports in zip(tasks, results)}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        chunk_size = max(1, len(tasks) // (processes * 4))
+        results = executor.map(_check_model, tasks, chunksize=chunk_size)
+        return {task[0]: reports for task, reports in zip(tasks, results)}
@@ -0,0 +1,63 @@
+"""Block compression codecs of avro object container files"""
+
+import binascii
+import bz2
+import lzma
+import zlib
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, Union
+
+Data = Union[bytes, memoryview]
+
+
+class Compression(NamedTuple):
+    """Compression function of a codec and the levels to try when tuning, None is the default level"""
+
+    compress: Callable[[Data, Optional[int]], bytes]
+    levels: Sequence[Optional[int]]
+
+
+def _null(data: Data, level: Optional[int]) -> bytes:
+    return bytes(data)
+
+
+def _deflate(data: Data, level: Optional[int]) -> bytes:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _bzip2(data: Data, level: Optional[int]) -> bytes:
+    return bz2.compress(data, 9 if level is None else level)
+
+
+def _xz(data: Data, level: Optional[int]) -> bytes:
+    return lzma.compress(data, preset=level)
+
+
+# Compression per avro codec name, snappy and zstandard are only available when their package is installed
+CODECS: Dict[str, Compression] = {
+    "null": Compression(_null, [None]),
+    "deflate": Compression(_deflate, [1, 6, 9]),
+    "bzip2": Compression(_bzip2, [1, 9]),
+    "xz": Compression(_xz, [0, 6]),
+}
+
+try:
+    import snappy  # type: ignore
+
+    def _snappy(data: Data, level: Optional[int]) -> bytes:
+        # Avro adds the big endian CRC32 of the uncompressed data to every snappy block
+        return snappy.compress(bytes(data)) + (binascii.crc32(data) & 0xFFFFFFFF).to_bytes(4, "big")
+
+    CODECS["snappy"] = Compression(_snappy, [None])
+except ImportError:  # pragma: no cover
+    pass
+
+try:
+    import zstandard  # type: ignore
+
+    def _zstandard(data: Data, level: Optional[int]) -> bytes:
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+    CODECS["zstandard"] = Compression(_zstandard, [1, 3, 9, 19])
+except ImportError:  # pragma: no cover
+    pass
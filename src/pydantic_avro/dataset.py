@@ -0,0 +1,198 @@
+"""Writing AvroBase models to a partitioned dataset of avro files"""
+
+import json
+import os
+import uuid
+from collections import OrderedDict
+from enum import Enum
+from operator import attrgetter
+from typing import Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type, Union
+from urllib.parse import quote
+
+from pydantic_avro.base import AvroBase
+from pydantic_avro.ocf import AvroFileWriter
+
+PartitionKey = Union[str, Tuple[str, Callable[[Any], Any]]]
+
+
+class _PartitionFile(NamedTuple):
+    """An open file of a single partition, written to a temporary path until it is closed"""
+
+    path: str
+    tmp_path: str
+    fh: BinaryIO
+    writer: AvroFileWriter
+    partition: Dict[str, str]
+
+
+def _fsync_directory(path: str):
+    """Make a rename in a directory durable, not supported on every platform"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:  # pragma: no cover
+        return
+    try:
+        os.fsync(fd)
+    except OSError:  # pragma: no cover
+        pass
+    finally:
+        os.close(fd)
+
+
+class DatasetWriter:
+    """
+    Writer of AvroBase models to avro files partitioned in directories
+
+    Every model is routed to a file of its partition, a directory per partition key like ``date=2022-01-01/tenant=a``.
+    At most ``max_open_files`` files are open at the same time, the least recently used file is closed when another
+    partition needs a file. A file is also closed when it reaches ``max_file_records`` records or ``max_file_bytes``
+    bytes, the next model of that partition starts a new file. Files are written under a temporary name, synced and
+    renamed when closed, so only complete files are visible. The files written by a run are listed in a manifest of
+    that run, so runs appending to the same dataset do not replace each other's manifests.
+
+        with DatasetWriter("/data/events", Event, partition_by=["tenant", ("date", lambda e: e.ts.date())]) as w:
+            for event in events:
+                w.write(event)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model: Type[AvroBase],
+        partition_by: Sequence[PartitionKey],
+        max_open_files: int = 16,
+        max_file_records: Optional[int] = None,
+        max_file_bytes: Optional[int] = None,
+        codec: str = "null",
+        block_size: int = 64 * 1024,
+        level: Optional[int] = None,
+        target_block_time: Optional[float] = None,
+        manifest_name: Optional[str] = "_manifest-{run_id}.json",
+    ):
+        """
+        :param path: base directory of the dataset
+        :param model: AvroBase class of the models to write
+        :param partition_by: field names, or tuples of a name and a function of the model, to partition by
+        :param max_open_files: maximum number of files open at the same time
+        :param max_file_records: number of records after which a file is closed
+        :param max_file_bytes: size in bytes on disk after which a file is closed
+        :param codec: compression codec of the avro files, with "auto" it is picked once for the model class
+        :param block_size: block size of the avro files
+        :param level: compression level of the codec
+        :param target_block_time: seconds to encode and compress a block, to adjust the block size at run time
+        :param manifest_name: name of the manifest in the base directory, "{run_id}" is replaced by the id of the run,
+            None to not write a manifest
+        """
+        if max_open_files < 1:
+            raise ValueError("max_open_files must be at least 1")
+        self.path = path
+        self.model = model
+        self.partition_keys: List[Tuple[str, Callable[[Any], Any]]] = [
+            (key, attrgetter(key)) if isinstance(key, str) else key for key in partition_by
+        ]
+        self.max_open_files = max_open_files
+        self.max_file_records = max_file_records
+        self.max_file_bytes = max_file_bytes
+        self.codec = codec
+        self.block_size = block_size
+        self.level = level
+        self.target_block_time = target_block_time
+        self.manifest: List[dict] = []
+        self.run_id = uuid.uuid4().hex[:12]
+        self.manifest_path = (
+            None if manifest_name is None else os.path.join(path, manifest_name.format(run_id=self.run_id))
+        )
+        self._file_counter = 0
+        self._files: "OrderedDict[Tuple[Any, ...], _PartitionFile]" = OrderedDict()
+
+    def write(self, model: AvroBase):
+        key = tuple(f(model) for _, f in self.partition_keys)
+        partition_file = self._files.get(key)
+        if partition_file is None:
+            partition_file = self._open(key)
+        else:
+            self._files.move_to_end(key)
+
+        writer = partition_file.writer
+        writer.write(model)
+        if self.max_file_bytes is not None and writer.estimated_size >= self.max_file_bytes:
+            # The pending block is written, so the size of the file is known instead of estimated
+            writer.flush()
+        if (self.max_file_records is not None and writer.records + writer.pending_records >= self.max_file_records) or (
+            self.max_file_bytes is not None and writer.size >= self.max_file_bytes
+        ):
+            self._close(key)
+
+    def _open(self, key: Tuple[Any, ...]) -> _PartitionFile:
+        while len(self._files) >= self.max_open_files:
+            self._close(next(iter(self._files)))
+
+        partition = {
+            name: str(value.value if isinstance(value, Enum) else value)
+            for (name, _), value in zip(self.partition_keys, key)
+        }
+        directory = os.path.join(self.path, *(f"{name}={quote(value, safe='')}" for name, value in partition.items()))
+        os.makedirs(directory, exist_ok=True)
+        self._file_counter += 1
+        name = f"part-{self.run_id}-{self._file_counter:05d}.avro"
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        fh = open(tmp_path, "wb")
+        writer = AvroFileWriter(
+            fh,
+            self.model.avro_codec(),
+            codec=self.codec,
+            block_size=self.block_size,
+            level=self.level,
+            target_block_time=self.target_block_time,
+        )
+        partition_file = _PartitionFile(os.path.join(directory, name), tmp_path, fh, writer, partition)
+        self._files[key] = partition_file
+        return partition_file
+
+    def _close(self, key: Tuple[Any, ...]):
+        partition_file = self._files.pop(key)
+        partition_file.writer.close()
+        os.fsync(partition_file.fh.fileno())
+        partition_file.fh.close()
+        os.replace(partition_file.tmp_path, partition_file.path)
+        _fsync_directory(os.path.dirname(partition_file.path))
+        self.manifest.append(
+            {
+                "path": os.path.relpath(partition_file.path, self.path),
+                "partition": partition_file.partition,
+                "records": partition_file.writer.records,
+                "bytes": partition_file.writer.size,
+            }
+        )
+
+    def close(self) -> List[dict]:
+        """Close all open files and write the manifest, returns the manifest entries"""
+        while self._files:
+            self._close(next(iter(self._files)))
+        if self.manifest_path is not None:
+            directory, name = os.path.split(self.manifest_path)
+            tmp_path = os.path.join(directory, f".{name}.tmp")
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w") as fh:
+                json.dump({"run_id": self.run_id, "files": self.manifest}, fh, indent=2)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, self.manifest_path)
+            _fsync_directory(directory)
+        return self.manifest
+
+    def abort(self):
+        """Close and remove all files that are not complete yet, files already closed are kept"""
+        while self._files:
+            _, partition_file = self._files.popitem(last=False)
+            partition_file.fh.close()
+            os.remove(partition_file.tmp_path)
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
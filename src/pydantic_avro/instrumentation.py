@@ -0,0 +1,207 @@
+"""
+Optional instrumentation of the hot paths of pydantic-avro
+
+Instrumentation is disabled by default. When disabled every instrumented call only checks the module level ``enabled``
+flag. When enabled, durations are collected per phase and model in histograms, together with cache hit rates and bytes
+encoded. The collected data can be read with ``stats()``, or exported by registering a callback with ``add_callback``.
+
+    with instrumentation.profile() as p:
+        run_batch()
+    print(p.stats())
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Upper bounds in seconds of the duration histogram buckets, the last bucket has no upper bound
+BUCKETS: List[float] = [1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0]
+
+enabled = False
+
+
+class Event(NamedTuple):
+    """A single measurement, passed to the registered callbacks"""
+
+    phase: str
+    model: str
+    duration: float = 0.0
+    size: int = 0
+    # Only set for cache lookups
+    hit: Optional[bool] = None
+
+
+class _Timing:
+    __slots__ = ("count", "total", "min", "max", "size", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.size = 0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, duration: float, size: int):
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+        self.size += size
+        self.histogram[bisect.bisect_left(BUCKETS, duration)] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "bytes": self.size,
+            "histogram": {str(b): n for b, n in zip(BUCKETS + [float("inf")], self.histogram)},
+        }
+
+
+class Collector:
+    """Collected measurements, see ``stats``"""
+
+    def __init__(self):
+        self._timings: Dict[Tuple[str, str], _Timing] = {}
+        self._caches: Dict[Tuple[str, str], List[int]] = {}
+
+    def add(self, event: Event):
+        if event.hit is None:
+            key = (event.phase, event.model)
+            timing = self._timings.get(key)
+            if timing is None:
+                timing = self._timings[key] = _Timing()
+            timing.add(event.duration, event.size)
+        else:
+            counts = self._caches.setdefault((event.phase, event.model), [0, 0])
+            counts[0 if event.hit else 1] += 1
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the collected measurements
+
+        :return: dict with "phases" and "caches", both keyed by phase or cache name and then by model name
+        """
+        with _lock:
+            phases: Dict[str, Dict[str, dict]] = {}
+            for (phase, model), timing in self._timings.items():
+                phases.setdefault(phase, {})[model] = timing.snapshot()
+            caches: Dict[str, Dict[str, dict]] = {}
+            for (cache, model), (hits, misses) in self._caches.items():
+                caches.setdefault(cache, {})[model] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses),
+                }
+        return {"phases": phases, "caches": caches}
+
+
+_lock = threading.Lock()
+_global = Collector()
+_global_enabled = False
+# Profiles of the current thread, and the number of profiles active in any thread
+_local = threading.local()
+_active_profiles = 0
+_callbacks: List[Callable[[Event], None]] = []
+
+
+def _update():
+    global enabled
+    enabled = _global_enabled or _active_profiles > 0
+
+
+def _profiles() -> Tuple[Collector, ...]:
+    return getattr(_local, "profiles", ())
+
+
+def enable():
+    """Start collecting measurements"""
+    global _global_enabled
+    _global_enabled = True
+    _update()
+
+
+def disable():
+    """Stop collecting measurements, already collected measurements are kept"""
+    global _global_enabled
+    _global_enabled = False
+    _update()
+
+
+def reset():
+    """Remove all measurements collected by ``stats``"""
+    global _global
+    with _lock:
+        _global = Collector()
+
+
+def stats() -> dict:
+    """Return a snapshot of all measurements since the last ``reset``"""
+    return _global.stats()
+
+
+def add_callback(callback: Callable[[Event], None]):
+    """
+    Register a callback that is called with every ``Event`` while instrumentation is enabled
+
+    Without ``enable`` only the events of threads within a ``profile`` block are passed.
+    """
+    _callbacks.append(callback)
+
+
+def remove_callback(callback: Callable[[Event], None]):
+    _callbacks.remove(callback)
+
+
+@contextmanager
+def profile() -> Iterator[Collector]:
+    """
+    Collect the measurements of the current thread within the block separately
+
+    This also works when instrumentation is not enabled globally, measurements of other threads are not collected.
+    """
+    global _active_profiles
+    collector = Collector()
+    profiles = _profiles()
+    _local.profiles = profiles + (collector,)
+    with _lock:
+        _active_profiles += 1
+        _update()
+    try:
+        yield collector
+    finally:
+        _local.profiles = profiles
+        with _lock:
+            _active_profiles -= 1
+            _update()
+
+
+def emit(event: Event):
+    """Record a measurement, only to be called when instrumentation is enabled"""
+    profiles = _profiles()
+    if not _global_enabled and not profiles:
+        # Only enabled for a profile of another thread
+        return
+    with _lock:
+        if _global_enabled:
+            _global.add(event)
+        for collector in profiles:
+            collector.add(event)
+    for callback in _callbacks:
+        callback(event)
+
+
+def record(phase: str, model: str, start: float, size: int = 0):
+    """Record the duration of a phase that started at ``start``, a value of ``time.perf_counter``"""
+    emit(Event(phase, model, time.perf_counter() - start, size))
+
+
+def record_cache(cache: str, model: str, hit: bool):
+    """Record a cache lookup"""
+    emit(Event(cache, model, hit=hit))
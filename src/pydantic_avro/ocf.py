@@ -0,0 +1,235 @@
+"""Writing avro object container files"""
+
+import json
+import os
+import time
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+from pydantic_avro import tuning
+from pydantic_avro.codec import AvroCodec, _write_bytes, _write_long
+from pydantic_avro.compression import CODECS
+
+MAGIC = b"Obj\x01"
+SYNC_SIZE = 16
+# Bounds of the block size when it is adjusted at run time
+MIN_BLOCK_SIZE = 4 * 1024
+MAX_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class AvroFileWriter:
+    """
+    Writer of an avro object container file
+
+    Records are encoded into a reused block buffer. A block is compressed and written when it reaches ``block_size``
+    bytes or ``block_records`` records.
+
+    With codec "auto" the first ``tune_records`` records, and at least as many as fill the largest block size of
+    ``tuning.BLOCK_SIZES``, are used to pick the codec, level and block size, see ``pydantic_avro.tuning``. When the
+    records are AvroBase models the choice is remembered for the model class and goal, and reused by later writers with
+    the same goal. With ``target_block_time`` the block size is adjusted after every block, so encoding and compressing
+    a block takes about that many seconds.
+    """
+
+    def __init__(
+        self,
+        fo: BinaryIO,
+        schema: Union[dict, AvroCodec],
+        codec: str = "null",
+        block_size: int = 64 * 1024,
+        block_records: Optional[int] = None,
+        metadata: Optional[Dict[str, bytes]] = None,
+        level: Optional[int] = None,
+        tune_records: int = 1000,
+        goal: Union[str, float] = "balanced",
+        target_block_time: Optional[float] = None,
+    ):
+        """
+        :param fo: binary file object to write to
+        :param schema: avro schema, or a compiled codec of it
+        :param codec: compression codec of the blocks, one of ``CODECS`` or "auto"
+        :param block_size: size in bytes of the uncompressed data after which a block is written
+        :param block_records: optional maximum number of records in a block
+        :param metadata: extra metadata for the file header
+        :param level: compression level of the codec, default level of the codec when not given
+        :param tune_records: minimum number of records to sample with codec "auto"
+        :param goal: goal of codec "auto": "throughput", "size", "balanced" or the weight of the size between 0 and 1
+        :param target_block_time: seconds to encode and compress a block, to adjust the block size at run time
+        """
+        if codec not in CODECS and codec != "auto":
+            raise ValueError(f"Codec {codec} not supported, use one of {', '.join(CODECS)} or auto")
+        self.fo = fo
+        self.schema_codec = schema if isinstance(schema, AvroCodec) else AvroCodec(schema)
+        self.codec = codec
+        self.level = level
+        self.block_size = block_size
+        self.block_records = block_records
+        self.tune_records = tune_records
+        self.goal = goal
+        self.target_block_time = target_block_time
+        self.metadata = metadata or {}
+        self.sync_marker = os.urandom(SYNC_SIZE)
+        # Number of records and bytes written to the file, without the records in the current block
+        self.records = 0
+        self.size = 0
+        # Uncompressed and compressed size of the written blocks, to estimate the compressed size of the next block
+        self._raw_size = 0
+        self._compressed_size = 0
+        self._block = bytearray(block_size)
+        self._block_pos = 0
+        self._block_count = 0
+        self._encode_seconds = 0.0
+        # Offsets of the sampled records while the codec is not picked yet
+        self._offsets: Optional[List[int]] = [0] if codec == "auto" else None
+        self._model: Optional[type] = None
+        if codec != "auto":
+            self._write_header()
+
+    def _write_header(self):
+        header = bytearray(MAGIC)
+        meta = {"avro.schema": json.dumps(self.schema_codec.schema).encode(), "avro.codec": self.codec.encode()}
+        meta.update(self.metadata)
+        pos = _write_long(header, len(header), len(meta))
+        for key, value in meta.items():
+            pos = _write_bytes(header, pos, key.encode())
+            pos = _write_bytes(header, pos, value)
+        pos = _write_long(header, pos, 0)
+        del header[pos:]
+        header += self.sync_marker
+        self._write(header)
+
+    def _write(self, data: Union[bytes, bytearray]):
+        self.fo.write(data)
+        self.size += len(data)
+
+    @property
+    def pending_records(self) -> int:
+        """Number of records in the block that is not written yet"""
+        return self._block_count
+
+    @property
+    def pending_size(self) -> int:
+        """Uncompressed size of the block that is not written yet"""
+        return self._block_pos
+
+    @property
+    def estimated_size(self) -> int:
+        """Size of the file including the pending block, compressed as well as the blocks written so far"""
+        ratio = self._compressed_size / self._raw_size if self._raw_size else 1.0
+        return self.size + int(self._block_pos * ratio)
+
+    def write(self, record: Any):
+        """Write a single record, a dict or pydantic model"""
+        if self._offsets is not None:
+            self._write_sample(record)
+            return
+        if self.target_block_time is None:
+            self._block_pos += self.schema_codec.encode(record, self._block, self._block_pos)
+        else:
+            start = time.perf_counter()
+            self._block_pos += self.schema_codec.encode(record, self._block, self._block_pos)
+            self._encode_seconds += time.perf_counter() - start
+        self._block_count += 1
+        if self._block_pos >= self.block_size or (
+            self.block_records is not None and self._block_count >= self.block_records
+        ):
+            self.flush()
+
+    def _write_sample(self, record: Any):
+        """Collect a record to tune on, the codec is picked once enough records are collected"""
+        assert self._offsets is not None
+        if self._block_count == 0 and isinstance(record, BaseModel):
+            self._model = type(record)
+            known = tuning.get_tuning(self._model, self.goal)
+            if known is not None:
+                self._use_tuning(known, [0])
+                self.write(record)
+                return
+        start = time.perf_counter()
+        self._block_pos += self.schema_codec.encode(record, self._block, self._block_pos)
+        self._encode_seconds += time.perf_counter() - start
+        self._block_count += 1
+        self._offsets.append(self._block_pos)
+        if self._block_count >= self.tune_records and self._block_pos >= max(tuning.BLOCK_SIZES):
+            self._tune()
+
+    def _tune(self):
+        assert self._offsets is not None
+        if self._block_count == 0:
+            result = tuning.Tuning("null", None, self.block_size)
+        else:
+            with memoryview(self._block) as view:
+                result = tuning.tune(
+                    view[: self._block_pos],
+                    self._offsets,
+                    self._encode_seconds,
+                    goal=self.goal,
+                    block_size=self.block_size,
+                )
+            if self._model is not None:
+                tuning.set_tuning(self._model, result, self.goal)
+        self._use_tuning(result, self._offsets)
+
+    def _use_tuning(self, result: tuning.Tuning, offsets: List[int]):
+        """Write the header with the picked codec and write the sampled records in blocks of the picked size"""
+        self.codec, self.level, self.block_size = result.codec, result.level, result.block_size
+        self._offsets = None
+        self._encode_seconds = 0.0
+        self._write_header()
+
+        start, count = 0, 0
+        with memoryview(self._block) as view:
+            for end in offsets[1:]:
+                count += 1
+                if end - start >= self.block_size or (self.block_records is not None and count >= self.block_records):
+                    self._write_block(view[start:end], count)
+                    start, count = end, 0
+        # The remaining records move to the start of the block buffer
+        self._block[: self._block_pos - start] = self._block[start : self._block_pos]
+        self._block_pos -= start
+        self._block_count = count
+
+    def _write_block(self, data: memoryview, count: int):
+        compressed = CODECS[self.codec].compress(data, self.level)
+        header = bytearray(20)
+        pos = _write_long(header, 0, count)
+        pos = _write_long(header, pos, len(compressed))
+        self._write(header[:pos])
+        self._write(compressed)
+        self._write(self.sync_marker)
+        self.records += count
+        self._raw_size += len(data)
+        self._compressed_size += len(compressed)
+
+    def flush(self):
+        """Write the current block, if any, while tuning the codec is picked on the records so far"""
+        if self._offsets is not None:
+            self._tune()
+        if self._block_count == 0:
+            return
+        start = time.perf_counter()
+        with memoryview(self._block) as view:
+            self._write_block(view[: self._block_pos], self._block_count)
+        if self.target_block_time is not None:
+            self._adjust_block_size(self._encode_seconds + time.perf_counter() - start)
+        self._block_pos = 0
+        self._block_count = 0
+        self._encode_seconds = 0.0
+
+    def _adjust_block_size(self, seconds: float):
+        """Move the block size halfway towards the size that takes ``target_block_time`` to encode and compress"""
+        assert self.target_block_time is not None
+        target = self._block_pos / max(seconds, 1e-9) * self.target_block_time
+        self.block_size = int(min(max((self.block_size + target) / 2, MIN_BLOCK_SIZE), MAX_BLOCK_SIZE))
+
+    def close(self):
+        """Write the last block and flush the file object, the file object itself is not closed"""
+        self.flush()
+        self.fo.flush()
+
+    def __enter__(self) -> "AvroFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,107 @@
+import importlib
+import json
+import pkgutil
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional, Set, Type, Union
+
+from pydantic_avro.base import AvroBase, AvroSchemaMemo
+
+
+def find_models(modules: Iterable[Union[str, ModuleType]]) -> List[Type[AvroBase]]:
+    """Return all AvroBase subclasses defined in the given modules, packages are searched recursively"""
+    module_names: Set[str] = set()
+    for module in modules:
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        module_names.add(module.__name__)
+        if hasattr(module, "__path__"):
+            for info in pkgutil.walk_packages(module.__path__, prefix=f"{module.__name__}."):
+                importlib.import_module(info.name)
+                module_names.add(info.name)
+
+    models: List[Type[AvroBase]] = []
+    seen: Set[Type[AvroBase]] = set()
+    pending = list(AvroBase.__subclasses__())
+    while pending:
+        cls = pending.pop(0)
+        if cls in seen:
+            continue
+        seen.add(cls)
+        pending.extend(cls.__subclasses__())
+        if cls.__module__ in module_names:
+            models.append(cls)
+    return sorted(models, key=lambda m: (m.__module__, m.__qualname__))
+
+
+def _dependency_order(models: List[Type[AvroBase]], by_alias: bool) -> List[Type[AvroBase]]:
+    """Sort models so that models used as a nested type come before the models using them"""
+    # Models with the same class name in different modules are told apart by their pydantic definition
+    by_name: Dict[str, List[Type[AvroBase]]] = {}
+    for m in models:
+        by_name.setdefault(m.__name__, []).append(m)
+    ordered: List[Type[AvroBase]] = []
+    visited: Set[Type[AvroBase]] = set()
+
+    def visit(model: Type[AvroBase]):
+        if model in visited:
+            return
+        visited.add(model)
+        for name, definition in model.schema(by_alias=by_alias).get("definitions", {}).items():
+            for dependency in by_name.get(name, []):
+                schema = dependency.schema(by_alias=by_alias)
+                if {k: v for k, v in schema.items() if k != "definitions"} == definition:
+                    visit(dependency)
+        ordered.append(model)
+
+    for model in models:
+        visit(model)
+    return ordered
+
+
+def models_to_avsc(
+    models: Iterable[Type[AvroBase]],
+    by_alias: bool = True,
+    namespace: Optional[str] = None,
+    deduplicate: bool = False,
+) -> Dict[str, dict]:
+    """
+    Generate the avro schemas of many models in one pass
+
+    Nested models shared between the models are only converted once. With ``deduplicate`` a shared named type is
+    only defined in the first schema using it and the schemas are returned in dependency order, so the values can be
+    parsed as one list of named schemas. The default namespace is then the module of each model, so models with the
+    same class name in different modules get different full names. Without it every schema is standalone, note that
+    nested definitions are shared between the returned dicts.
+
+    :param models: AvroBase subclasses to generate the schema for
+    :param by_alias: generate the schemas using the aliases defined, if any
+    :param namespace: Provide an optional namespace string to use for all schemas, with ``deduplicate`` a ValueError is
+        raised when different models get the same full name
+    :param deduplicate: define shared named types once and refer to them by name
+    :return: dict of the full python name of each model to its avro schema
+    """
+    models = list(models)
+    if deduplicate:
+        models = _dependency_order(models, by_alias)
+    memo = AvroSchemaMemo(deduplicate=deduplicate)
+    return {
+        f"{m.__module__}.{m.__qualname__}": m.avro_schema(
+            by_alias=by_alias, namespace=m.__module__ if deduplicate and namespace is None else namespace, memo=memo
+        )
+        for m in models
+    }
+
+
+def convert_modules(
+    modules: List[str],
+    output_path: Optional[str] = None,
+    namespace: Optional[str] = None,
+    deduplicate: bool = False,
+):
+    schemas = models_to_avsc(find_models(modules), namespace=namespace, deduplicate=deduplicate)
+    file_content = json.dumps(schemas, indent=2)
+    if output_path is None:
+        print(file_content)
+    else:
+        with open(output_path, "w") as fh:
+            fh.write(file_content)
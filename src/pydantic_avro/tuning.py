@@ -0,0 +1,158 @@
+"""
+Choosing the compression codec, level and block size of avro files
+
+``tune`` compresses a sample of encoded records with every available codec and level, split in blocks of several sizes,
+and picks the setting with the lowest cost for the given goal. The cost is a weighted sum of the file size and the time
+to encode and compress, both relative to the best candidate. ``tune_model`` also remembers the choice per model class
+and goal, see ``get_tuning``, ``save_tunings`` and ``load_tunings``.
+"""
+
+import json
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type, Union
+
+from pydantic_avro.codec import AvroCodec
+from pydantic_avro.compression import CODECS
+
+# Weight of the file size in the cost per goal, the remaining weight is for the time
+GOALS: Dict[str, float] = {"throughput": 0.0, "balanced": 0.5, "size": 1.0}
+BLOCK_SIZES: List[int] = [16 * 1024, 64 * 1024, 256 * 1024]
+# Bytes added to every block: record count, block size and sync marker
+BLOCK_OVERHEAD = 22
+
+
+class Candidate(NamedTuple):
+    codec: str
+    level: Optional[int]
+    block_size: int
+    # Time to encode and compress the sample
+    seconds: float
+    # Size of the sample in the file
+    size: int
+
+
+class Tuning(NamedTuple):
+    codec: str
+    level: Optional[int]
+    block_size: int
+    candidates: List[Candidate] = []
+
+
+Goal = Union[str, float]
+
+# Picked setting per full name of the model class and goal
+_tunings: Dict[Tuple[str, Goal], Tuning] = {}
+
+
+def _blocks(data: memoryview, offsets: Sequence[int], block_size: int) -> List[memoryview]:
+    """Split encoded records at record boundaries in blocks of at least ``block_size`` bytes"""
+    blocks = []
+    start = offsets[0]
+    for end in offsets[1:]:
+        if end - start >= block_size:
+            blocks.append(data[start:end])
+            start = end
+    if start < offsets[-1]:
+        blocks.append(data[start : offsets[-1]])
+    return blocks
+
+
+def tune(
+    data: Union[bytes, bytearray, memoryview],
+    offsets: Sequence[int],
+    encode_seconds: float = 0.0,
+    goal: Goal = "balanced",
+    codecs: Optional[Sequence[str]] = None,
+    block_sizes: Sequence[int] = BLOCK_SIZES,
+    repeat: int = 3,
+    block_size: Optional[int] = None,
+) -> Tuning:
+    """
+    Pick the codec, level and block size for already encoded records
+
+    :param data: encoded records after each other
+    :param offsets: offsets of the records in data, one more than the number of records, as returned by ``encode_many``
+    :param encode_seconds: time it took to encode the records, added to the time of every candidate
+    :param goal: "throughput", "size", "balanced" or the weight of the size between 0 and 1
+    :param codecs: codecs to try, default all available
+    :param block_sizes: block sizes to try
+    :param repeat: number of times to compress, the fastest time is used
+    :param block_size: block size to prefer when candidates cost the same, used when the sample is smaller than all
+        block sizes
+    :return: the best setting, together with all candidates
+    """
+    size_weight = GOALS[goal] if isinstance(goal, str) else goal
+    view = memoryview(data)
+    # Block sizes larger than the sample all give a single block, they can not be told apart
+    sample_size = offsets[-1] - offsets[0]
+    sizes = [b for b in block_sizes if b <= sample_size] or [block_size or min(block_sizes)]
+    candidates = []
+    for size_of_block in sizes:
+        blocks = _blocks(view, offsets, size_of_block)
+        for codec in codecs or CODECS:
+            compress = CODECS[codec].compress
+            for level in CODECS[codec].levels:
+                seconds = float("inf")
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    size = sum(len(compress(b, level)) + BLOCK_OVERHEAD for b in blocks)
+                    seconds = min(seconds, time.perf_counter() - start)
+                candidates.append(Candidate(codec, level, size_of_block, encode_seconds + seconds, size))
+
+    best_seconds = min(c.seconds for c in candidates) or 1e-9
+    best_size = min(c.size for c in candidates) or 1
+
+    def cost(c: Candidate) -> float:
+        return size_weight * c.size / best_size + (1 - size_weight) * c.seconds / best_seconds
+
+    best = min(candidates, key=lambda c: (cost(c), c.block_size != block_size))
+    return Tuning(best.codec, best.level, best.block_size, candidates)
+
+
+def tune_records(records: Sequence[Any], schema: Union[dict, AvroCodec], **kwargs) -> Tuning:
+    """Encode a sample of records, dicts or models, and pick the best setting for them, see ``tune``"""
+    codec = schema if isinstance(schema, AvroCodec) else AvroCodec(schema)
+    buffer = bytearray()
+    start = time.perf_counter()
+    offsets = codec.encode_many(records, buffer)
+    return tune(buffer, offsets, time.perf_counter() - start, **kwargs)
+
+
+def _key(model: type) -> str:
+    return f"{model.__module__}.{model.__qualname__}"
+
+
+def tune_model(model: Type[Any], sample: Sequence[Any], goal: Goal = "balanced", **kwargs) -> Tuning:
+    """Pick the best setting for a sample of models of an AvroBase class and remember it for the class and goal"""
+    tuning = tune_records(sample, model.avro_codec(), goal=goal, **kwargs)
+    set_tuning(model, tuning, goal)
+    return tuning
+
+
+def get_tuning(model: type, goal: Goal = "balanced") -> Optional[Tuning]:
+    """Return the setting picked for a model class and goal, if any"""
+    return _tunings.get((_key(model), goal))
+
+
+def set_tuning(model: type, tuning: Tuning, goal: Goal = "balanced"):
+    _tunings[(_key(model), goal)] = tuning
+
+
+def save_tunings(path: str):
+    """Save the settings picked for all model classes and goals to a json file"""
+    with open(path, "w") as fh:
+        json.dump(
+            [
+                {"model": model, "goal": goal, "codec": t.codec, "level": t.level, "block_size": t.block_size}
+                for (model, goal), t in _tunings.items()
+            ],
+            fh,
+        )
+
+
+def load_tunings(path: str):
+    """Load settings saved by ``save_tunings``, codecs that are not available are skipped"""
+    with open(path) as fh:
+        for t in json.load(fh):
+            if t["codec"] in CODECS:
+                _tunings[(t["model"], t["goal"])] = Tuning(t["codec"], t["level"], t["block_size"])
@@ -0,0 +1,8 @@
+"""Models with the same class names as models in test_pydantic_to_avro"""
+
+from pydantic_avro.base import AvroBase
+
+
+class Address(AvroBase):
+    street: str
+    number: int
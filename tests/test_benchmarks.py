@@ -0,0 +1,36 @@
+from fastavro import parse_schema
+
+from benchmarks.compare import compare
+from benchmarks.models import SCENARIOS, make_instance, make_model
+from benchmarks.runner import measure
+
+
+def test_synthetic_models():
+    for name, shape in SCENARIOS.items():
+        model = make_model(f"Test{name.title()}", shape)
+        parse_schema(model.avro_schema())
+        assert make_instance(model, shape, seed=1) == make_instance(model, shape, seed=1)
+
+
+def test_measure():
+    result = measure(lambda: [0] * 1000, min_time=0.001)
+    assert result["ops_per_sec"] > 0
+    assert result["peak_memory"] >= 8000
+
+    kept: list = []
+    result = measure(lambda: kept.append([[0] for _ in range(100)]), min_time=0.001)
+    assert result["retained_blocks"] >= 100
+
+
+def test_compare():
+    metrics = {"ops_per_sec": 1, "peak_memory": 1}
+    baseline = {"results": {"a": {"ops_per_sec": 100.0, "peak_memory": 100}, "b": metrics}}
+    current = {"results": {"a": {"ops_per_sec": 85.0, "peak_memory": 105, "retained_blocks": 20}, "c": metrics}}
+    changes = compare(baseline, current, threshold=0.1)
+    assert [(c.name, c.metric, c.regression) for c in changes] == [
+        ("a", "ops_per_sec", True),
+        ("a", "peak_memory", False),
+    ]
+    # Metrics missing from one of the runs are skipped
+    del baseline["results"]["a"]["peak_memory"]
+    assert [c.metric for c in compare(baseline, current)] == ["ops_per_sec"]
@@ -0,0 +1,199 @@
+import enum
+import io
+import uuid
+from datetime import date, datetime, time, timezone
+from typing import Dict, List, Optional
+
+import pytest
+from fastavro import parse_schema, schemaless_reader, schemaless_writer
+from pydantic import Field
+
+from pydantic_avro.base import AvroBase
+from pydantic_avro.codec import AvroCodec
+from tests.test_to_avro import ComplexTestModel, Nested2Model, NestedModel, Status
+from tests.test_to_avro import TestModel as AllTypesModel
+
+
+class AliasModel(AvroBase):
+    field: str = Field(..., alias="Field")
+    nested: Optional[Nested2Model] = Field(None, alias="Nested")
+
+
+class CollectionModel(AvroBase):
+    c1: List[int]
+    c2: Dict[str, float]
+    c3: List[str]
+    c4: Optional[Status]
+
+
+def make_model() -> AllTypesModel:
+    return AllTypesModel(
+        c1="1",
+        c2=-2,
+        c3=3.5,
+        c4=datetime(2021, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+        c5=date(2021, 1, 2),
+        c6=time(3, 4, 5, 6),
+        c7=None,
+        c8=True,
+        c9=uuid.uuid4(),
+        c10=uuid.uuid4(),
+        c11={"key": "value"},
+        c12={},
+        c13=Status.failed,
+    )
+
+
+def assert_fastavro_compatible(model: AvroBase):
+    buffer = bytearray()
+    size = model.avro_encode_into(buffer)
+    expected = io.BytesIO()
+    schema = parse_schema(type(model).avro_schema())
+    schemaless_writer(expected, schema, model.dict(by_alias=True))
+    assert bytes(buffer[:size]) == expected.getvalue()
+    assert type(model).parse_obj(schemaless_reader(io.BytesIO(buffer[:size]), schema)) == model
+    assert type(model).avro_decode(memoryview(buffer)) == model
+
+
+def test_fastavro_compatible():
+    assert_fastavro_compatible(make_model())
+    assert_fastavro_compatible(
+        ComplexTestModel(
+            c1=["1", "2"],
+            c2=NestedModel(c11=Nested2Model(c111="test")),
+            c3=[NestedModel(c11=Nested2Model(c111="test"))],
+            c4=[datetime(2021, 1, 1, tzinfo=timezone.utc)],
+            c5={"key": NestedModel(c11=Nested2Model(c111="test"))},
+        )
+    )
+    assert_fastavro_compatible(AliasModel(Field="a", Nested=Nested2Model(c111="b")))
+    assert_fastavro_compatible(CollectionModel(c1=[1, -(2**40)], c2={"a": 1.5}, c3=["a", "b"], c4=None))
+
+
+def test_reuse_buffer():
+    model = make_model()
+    buffer = bytearray(4)
+    size = model.avro_encode_into(buffer, offset=2)
+    assert len(buffer) >= size + 2
+    # Encoding again at the same position overwrites the previous message
+    assert model.avro_encode_into(buffer, offset=2) == size
+    assert AllTypesModel.avro_decode(memoryview(buffer), offset=2) == model
+
+    view = memoryview(bytearray(size))
+    assert model.avro_encode_into(view) == size
+    with pytest.raises(BufferError):
+        model.avro_encode_into(memoryview(bytearray(size - 1)))
+
+
+def test_encode_many():
+    models = [CollectionModel(c1=list(range(i)), c2={}, c3=[], c4=Status.passed) for i in range(5)]
+    buffer = bytearray(1024)
+    offsets = CollectionModel.avro_encode_many(models, buffer, offset=10)
+    assert len(offsets) == 6
+    assert offsets[0] == 10
+    assert CollectionModel.avro_decode_many(memoryview(buffer), offsets) == models
+    assert CollectionModel.avro_decode(memoryview(buffer)[offsets[2] : offsets[3]]) == models[2]
+
+
+def test_codec_dict():
+    codec = AvroCodec(
+        {
+            "type": "record",
+            "name": "Test",
+            "namespace": "test",
+            "fields": [
+                {"name": "b", "type": {"type": "record", "name": "Inner", "fields": [{"name": "c", "type": "int"}]}},
+                {"name": "a", "type": ["null", "long", "string", "test.Inner"], "default": None},
+                {"name": "d", "type": "Inner"},
+                {"name": "e", "type": "string", "default": "x"},
+            ],
+        }
+    )
+    buffer = bytearray()
+    for a in [None, 1, "a", {"c": 2}]:
+        size = codec.encode({"a": a, "b": {"c": 1}, "d": {"c": 3}}, buffer)
+        assert codec.decode(buffer[:size]) == {"b": {"c": 1}, "a": a, "d": {"c": 3}, "e": "x"}
+    with pytest.raises(ValueError):
+        codec.encode({"a": 1.5, "b": {"c": 1}, "d": {"c": 3}}, buffer)
+
+
+class Color(str, enum.Enum):
+    red = "RED"
+    blue = "BLUE"
+
+
+def test_codec_dispatch():
+    codec = AvroCodec(
+        {
+            "type": "record",
+            "name": "Test",
+            "fields": [
+                {"name": "a", "type": {"type": "enum", "name": "Color", "symbols": ["RED", "BLUE"]}},
+                {"name": "b", "type": ["string", "null"]},
+                {"name": "c", "type": ["boolean", "long", "double"]},
+            ],
+        }
+    )
+    buffer = bytearray()
+    for a, b, c in [(Color.blue, None, True), ("RED", "x", 1), (Color.red, "y", 1.5), ("BLUE", None, False)]:
+        size = codec.encode({"a": a, "b": b, "c": c}, buffer)
+        result = codec.decode(memoryview(buffer)[:size])
+        assert result == {"a": a, "b": b, "c": c}
+        assert type(result["c"]) is type(c)
+    # BLUE, null as second branch of the union, first branch of the union, False
+    assert bytes(buffer[:size]) == b"\x02\x02\x00\x00"
+    with pytest.raises(ValueError):
+        codec.encode({"a": "GREEN", "b": None, "c": 1}, buffer)
+
+
+class A(AvroBase):
+    x: int
+
+
+class B(AvroBase):
+    y: str
+
+
+class Shape(str, enum.Enum):
+    square = "SQUARE"
+
+
+def test_codec_named_branches():
+    schema = {
+        "type": "record",
+        "name": "Test",
+        "fields": [
+            {
+                "name": "u",
+                "type": [
+                    "null",
+                    {"type": "record", "name": "A", "fields": [{"name": "x", "type": "long"}]},
+                    {"type": "record", "name": "B", "fields": [{"name": "y", "type": "string"}]},
+                ],
+            },
+            {
+                "name": "e",
+                "type": [
+                    {"type": "enum", "name": "Color", "symbols": ["RED", "BLUE"]},
+                    {"type": "enum", "name": "Shape", "symbols": ["SQUARE"]},
+                    "string",
+                ],
+            },
+        ],
+    }
+    codec = AvroCodec(schema)
+    parsed = parse_schema(schema)
+    buffer = bytearray()
+    for u, e in [({"y": "hi"}, "SQUARE"), ({"x": 1}, "RED"), (None, "other"), ({"y": "a"}, Shape.square)]:
+        size = codec.encode({"u": u, "e": e}, buffer)
+        expected = io.BytesIO()
+        schemaless_writer(expected, parsed, {"u": u, "e": e})
+        assert bytes(buffer[:size]) == expected.getvalue()
+        assert codec.decode(buffer[:size]) == {"u": u, "e": e}
+
+    # Models are matched by class name
+    for model in [B(y="hi"), A(x=1), B(y="again")]:
+        size = codec.encode({"u": model, "e": "BLUE"}, buffer)
+        assert codec.decode(buffer[:size]) == {"u": model.dict(), "e": "BLUE"}
+    with pytest.raises(ValueError):
+        codec.encode({"u": {"z": 1}, "e": "RED"}, buffer)
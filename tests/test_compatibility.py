@@ -0,0 +1,198 @@
+from typing import List, Optional
+
+import pytest
+from pydantic import Field
+
+from pydantic_avro import instrumentation
+from pydantic_avro.base import AvroBase
+from pydantic_avro.compatibility import (
+    CompatibilityChecker,
+    Incompatibility,
+    NormalizedSchema,
+    check_compatibility,
+    check_models,
+)
+
+
+def record(name: str, *fields: dict, **kwargs) -> dict:
+    return {"type": "record", "name": name, "fields": list(fields), **kwargs}
+
+
+ADDRESS = record("Address", {"name": "street", "type": "string"}, {"name": "number", "type": "int"})
+PERSON = record("Person", {"name": "name", "type": "string"}, {"name": "address", "type": ADDRESS})
+
+
+class Address(AvroBase):
+    street: str
+    number: int
+
+
+class PersonV1(AvroBase):
+    name: str
+    address: Address
+
+
+class PersonV2(AvroBase):
+    name: str
+    address: Address
+    nickname: Optional[str]
+    tags: List[str] = Field(default_factory=list)
+
+
+def person_schema(model: type) -> dict:
+    """Schema of a version of the Person model"""
+    return {**model.avro_schema(), "name": "Person", "namespace": "Person"}
+
+
+def test_compatible():
+    # Field with a default added, int promoted to long, optional field added
+    reader = record(
+        "Person",
+        {"name": "name", "type": ["null", "string"]},
+        {
+            "name": "address",
+            "type": record("Address", {"name": "street", "type": "string"}, {"name": "number", "type": "long"}),
+        },
+        {"name": "age", "type": "int", "default": 0},
+    )
+    assert check_compatibility(reader, PERSON) == []
+    assert check_compatibility(person_schema(PersonV2), person_schema(PersonV1)) == []
+
+
+def test_missing_default():
+    reader = record(
+        "Person",
+        {"name": "name", "type": "string"},
+        {
+            "name": "address",
+            "type": record("Address", {"name": "street", "type": "string"}, {"name": "zip", "type": "string"}),
+        },
+    )
+    assert check_compatibility(reader, PERSON) == [
+        Incompatibility("address.zip", "missing_default", "Field is not written and has no default")
+    ]
+    issues = check_compatibility(person_schema(PersonV1), person_schema(PersonV2))
+    assert issues == []
+    issues = check_compatibility(record("Person", {"name": "name", "type": "long"}), PERSON)
+    assert [(i.path, i.kind) for i in issues] == [("name", "type_mismatch")]
+
+
+def test_named_types():
+    writer = record(
+        "R",
+        {"name": "color", "type": {"type": "enum", "name": "Color", "symbols": ["RED", "GREEN", "BLUE"]}},
+        {"name": "hash", "type": {"type": "fixed", "name": "Hash", "size": 16}},
+        {"name": "values", "type": {"type": "array", "items": ["null", "string", "long"]}},
+    )
+    reader = record(
+        "R",
+        {"name": "color", "type": {"type": "enum", "name": "Color", "symbols": ["RED", "GREEN"]}},
+        {"name": "hash", "type": {"type": "fixed", "name": "Hash", "size": 32}},
+        {"name": "values", "type": {"type": "array", "items": ["null", "string"]}},
+    )
+    issues = check_compatibility(reader, writer)
+    assert [(i.path, i.kind) for i in issues] == [
+        ("color", "missing_symbols"),
+        ("hash", "size_mismatch"),
+        ("values[]", "missing_union_branch"),
+    ]
+    reader["fields"][0]["type"]["default"] = "RED"
+    assert [i.path for i in check_compatibility(reader, writer)] == ["hash", "values[]"]
+
+    renamed = record("Person2", {"name": "name", "type": "string"}, aliases=["Person"])
+    assert check_compatibility(renamed, PERSON) == []
+    assert [i.kind for i in check_compatibility(record("Other"), PERSON)] == ["name_mismatch"]
+
+
+def test_optional_record():
+    def schema(zip_type: str) -> dict:
+        address = record("Address", {"name": "zip", "type": zip_type})
+        return record(
+            "Person", {"name": "home", "type": ["null", address], "default": None}, {"name": "work", "type": "Address"}
+        )
+
+    # Changes in the record of an Optional model are reported per field, like those of a required model
+    assert check_compatibility(schema("string"), schema("int")) == [
+        Incompatibility("home.zip", "type_mismatch", "int can not be read as string"),
+        Incompatibility("work.zip", "type_mismatch", "int can not be read as string"),
+    ]
+    other = record("Person", {"name": "home", "type": ["null", record("Other")], "default": None})
+    assert [(i.path, i.kind) for i in check_compatibility(other, schema("int"))] == [("home", "missing_union_branch")]
+
+
+def test_recursive():
+    node = record("Node", {"name": "value", "type": "int"}, {"name": "next", "type": ["null", "Node"]})
+    new_node = record(
+        "Node",
+        {"name": "value", "type": "long"},
+        {"name": "next", "type": ["null", "Node"]},
+        {"name": "label", "type": "string"},
+    )
+    assert check_compatibility(node, node) == []
+    assert [(i.path, i.kind) for i in check_compatibility(new_node, node)] == [("label", "missing_default")]
+
+
+def recursive_schema(y_type: str, first_field: str, **default) -> dict:
+    """V with fields of records A and B that refer to each other"""
+    b = record("B", {"name": "a", "type": ["null", "A"]})
+    a = record("A", {"name": "b", "type": b}, {"name": "y", "type": y_type})
+    return record("V", {"name": first_field, "type": a, **default}, {"name": "q", "type": "B"})
+
+
+def test_recursive_memo():
+    reader = recursive_schema("int", "p", default={"b": {"a": None}, "y": 0})
+    writer = recursive_schema("string", "p2")
+    expected = check_compatibility(reader, writer)
+    assert [i.path for i in expected] == ["q.a.y"]
+
+    # Results that assumed the A pair compatible while it was being checked are not memoized
+    checker = CompatibilityChecker()
+    assert checker.check(recursive_schema("int", "p"), recursive_schema("string", "p")) != []
+    assert checker.check(reader, writer) == expected
+
+
+def test_fingerprint():
+    a = NormalizedSchema(PERSON)
+    b = NormalizedSchema({**PERSON, "doc": "A person"})
+    assert a.fingerprint() == b.fingerprint()
+    assert a.fingerprint("Address") == NormalizedSchema(ADDRESS).fingerprint()
+    changed = record("Person", {"name": "name", "type": "string"}, {"name": "address", "type": record("Address")})
+    assert NormalizedSchema(changed).fingerprint() != a.fingerprint()
+
+
+def test_memo():
+    checker = CompatibilityChecker()
+    company = record("Company", {"name": "address", "type": ADDRESS})
+    with instrumentation.profile() as profile:
+        checker.check(PERSON, PERSON)
+        checker.check(company, company)
+    # The Address pair is only compared once
+    stats = profile.stats()["caches"]["compatibility"]
+    assert (stats["Address"]["hits"], stats["Address"]["misses"]) == (1, 1)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_check_models(processes):
+    schemas = {"person": person_schema(PersonV1), "address": Address.avro_schema(), "new": PERSON}
+    previous = {
+        "person": [person_schema(PersonV2), record("Person", {"name": "name", "type": "long"})],
+        "address": [Address.avro_schema()],
+    }
+
+    reports = check_models(schemas, previous, processes=processes)
+    assert sorted(reports) == ["address", "person"]
+    assert [(r.version, r.direction, r.compatible) for r in reports["person"]] == [
+        (0, "backward", True),
+        (1, "backward", False),
+    ]
+    assert reports["person"][1].incompatibilities == [
+        Incompatibility("name", "type_mismatch", "long can not be read as string"),
+        Incompatibility("address", "missing_default", "Field is not written and has no default"),
+    ]
+
+    reports = check_models(schemas, previous, mode="full", processes=processes)
+    assert [(r.version, r.direction) for r in reports["address"]] == [(0, "backward"), (0, "forward")]
+    assert all(r.compatible for r in reports["address"])
+
+    with pytest.raises(ValueError):
+        check_models(schemas, previous, mode="sideways")
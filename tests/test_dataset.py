@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+from datetime import date
+from typing import Optional
+
+import pytest
+from fastavro import reader
+
+from pydantic_avro.base import AvroBase
+from pydantic_avro.dataset import DatasetWriter
+from pydantic_avro.ocf import AvroFileWriter
+from tests.test_to_avro import Status
+
+
+class Event(AvroBase):
+    tenant: str
+    day: date
+    status: Status
+    value: Optional[int]
+
+
+def read_file(path: str) -> list:
+    with open(path, "rb") as fh:
+        return [Event.parse_obj(r) for r in reader(fh)]
+
+
+def test_avro_file_writer():
+    events = [Event(tenant="a", day=date(2022, 1, i % 28 + 1), status=Status.passed, value=i) for i in range(100)]
+    for codec in ["null", "deflate"]:
+        with tempfile.TemporaryDirectory() as dir:
+            path = os.path.join(dir, "test.avro")
+            with open(path, "wb") as fh:
+                with AvroFileWriter(fh, Event.avro_codec(), codec=codec, block_records=30) as writer:
+                    for event in events:
+                        writer.write(event)
+            assert writer.records == 100
+            assert writer.size == os.path.getsize(path)
+            assert read_file(path) == events
+
+    with pytest.raises(ValueError):
+        AvroFileWriter(None, Event.avro_schema(), codec="unknown")  # type: ignore
+
+
+def test_dataset_writer():
+    events = [
+        Event(tenant=tenant, day=date(2022, 1, day), status=Status.passed, value=i)
+        for i in range(10)
+        for tenant in ["a", "b/c"]
+        for day in [1, 2, 3]
+    ]
+    with tempfile.TemporaryDirectory() as dir:
+        with DatasetWriter(dir, Event, partition_by=["tenant", ("date", lambda e: e.day)], max_open_files=2) as writer:
+            for event in events:
+                writer.write(event)
+        assert writer.manifest_path == os.path.join(dir, f"_manifest-{writer.run_id}.json")
+        with open(writer.manifest_path) as fh:
+            manifest = json.load(fh)["files"]
+
+        assert manifest == writer.manifest
+        # Every partition alternates, so only 2 open files means a new file for every event
+        assert len(manifest) == len(events)
+        assert sum(f["records"] for f in manifest) == len(events)
+        assert {tuple(f["partition"].values()) for f in manifest} == {
+            (tenant, f"2022-01-0{day}") for tenant in ["a", "b/c"] for day in [1, 2, 3]
+        }
+        for f in manifest:
+            path = os.path.join(dir, f["path"])
+            assert f["bytes"] == os.path.getsize(path)
+            assert all(e.tenant == f["partition"]["tenant"] for e in read_file(path))
+        assert os.path.isdir(os.path.join(dir, "tenant=b%2Fc", "date=2022-01-01"))
+        assert not [n for _, _, names in os.walk(dir) for n in names if n.endswith(".tmp")]
+
+
+def test_dataset_writer_rolling():
+    events = [Event(tenant="a", day=date(2022, 1, 1), status=Status.failed, value=i) for i in range(25)]
+    with tempfile.TemporaryDirectory() as dir:
+        with DatasetWriter(dir, Event, partition_by=["status"], max_file_records=10, codec="deflate") as writer:
+            for event in events:
+                writer.write(event)
+        assert [f["records"] for f in writer.manifest] == [10, 10, 5]
+        assert all(f["path"].startswith("status=failed" + os.sep) for f in writer.manifest)
+        assert [e for f in writer.manifest for e in read_file(os.path.join(dir, f["path"]))] == events
+
+        # The size is the compressed size on disk
+        many = [Event(tenant="b", day=date(2022, 1, 1), status=Status.passed, value=i * 7919) for i in range(20000)]
+        with DatasetWriter(dir, Event, partition_by=["tenant"], max_file_bytes=20000, codec="deflate") as writer:
+            for event in many:
+                writer.write(event)
+        sizes = [f["bytes"] for f in writer.manifest]
+        assert len(sizes) > 1
+        assert all(20000 <= size < 25000 for size in sizes[:-1])
+        assert sum(f["records"] for f in writer.manifest) == len(many)
+
+        with pytest.raises(RuntimeError):
+            with DatasetWriter(dir, Event, partition_by=["tenant"], manifest_name="other.json") as writer:
+                writer.write(events[0])
+                raise RuntimeError()
+        assert os.listdir(os.path.join(dir, "tenant=a")) == []
+        assert not os.path.exists(os.path.join(dir, "other.json"))
+
+
+def test_dataset_writer_runs():
+    # Runs appending to the same dataset each keep their own manifest
+    with tempfile.TemporaryDirectory() as dir:
+        for tenant in ["a", "b"]:
+            with DatasetWriter(dir, Event, partition_by=["tenant"]) as writer:
+                writer.write(Event(tenant=tenant, day=date(2022, 1, 1), status=Status.passed, value=1))
+        paths = []
+        for name in sorted(os.listdir(dir)):
+            if name.startswith("_manifest-"):
+                with open(os.path.join(dir, name)) as fh:
+                    paths.extend(f["path"] for f in json.load(fh)["files"])
+        assert sorted(os.path.dirname(p) for p in paths) == ["tenant=a", "tenant=b"]
@@ -169,6 +169,20 @@ def test_avsc_to_pydantic_complex():
     assert "class Nested(BaseModel):\n    pass\n" in pydantic_code
 
 
+def test_avsc_to_pydantic_complex_primitive():
+    pydantic_code = avsc_to_pydantic(
+        {
+            "name": "Test",
+            "type": "record",
+            "fields": [
+                {"name": "col1", "type": {"type": "array", "items": {"type": "long"}}},
+                {"name": "col2", "type": {"type": "map", "values": {"type": "boolean"}}},
+            ],
+        }
+    )
+    assert "class Test(BaseModel):\n" "    col1: List[int]\n" "    col2: Dict[str, bool]" in pydantic_code
+
+
 def test_default():
     pydantic_code = avsc_to_pydantic(
         {
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Optional
+
+from pydantic_avro import instrumentation
+from pydantic_avro.avro_to_pydantic import avsc_to_pydantic
+from pydantic_avro.base import AvroBase, AvroSchemaMemo
+
+
+class Inner(AvroBase):
+    c1: str
+
+
+class Outer(AvroBase):
+    c1: Inner
+    c2: Optional[int]
+
+
+class Other(AvroBase):
+    c1: Inner
+
+
+def test_disabled():
+    instrumentation.reset()
+    Outer.avro_schema()
+    assert instrumentation.stats() == {"phases": {}, "caches": {}}
+
+
+def test_enable():
+    class Enabled(AvroBase):
+        c1: Inner
+
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        Enabled.avro_schema()
+        Enabled.avro_schema()
+    finally:
+        instrumentation.disable()
+    Enabled.avro_schema()
+
+    stats = instrumentation.stats()
+    assert stats["phases"]["pydantic_schema"]["Enabled"]["count"] == 2
+    assert stats["phases"]["avro_schema"]["Enabled"]["count"] == 2
+    assert sum(stats["phases"]["avro_schema"]["Enabled"]["histogram"].values()) == 2
+    # The first call fills the pydantic schema cache
+    assert stats["caches"]["pydantic_schema"]["Enabled"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_profile_and_callback():
+    events = []
+    instrumentation.reset()
+    instrumentation.add_callback(events.append)
+    try:
+        with instrumentation.profile() as p:
+            memo = AvroSchemaMemo()
+            Outer.avro_schema(memo=memo)
+            Other.avro_schema(memo=memo)
+            code = avsc_to_pydantic(Outer.avro_schema())
+    finally:
+        instrumentation.remove_callback(events.append)
+    Outer.avro_schema()
+
+    assert not instrumentation.enabled
+    stats = p.stats()
+    assert stats["caches"]["named_types"]["Inner"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert stats["phases"]["avsc_to_pydantic"]["Outer"]["bytes"] == len(code)
+    assert stats["phases"]["avro_schema"]["Outer"]["count"] == 2
+    assert len(events) == 12
+    # Only the profile collects measurements when not enabled globally
+    assert instrumentation.stats() == {"phases": {}, "caches": {}}
+
+
+def test_profile_thread():
+    events = []
+    instrumentation.add_callback(events.append)
+    stop = threading.Event()
+
+    def other_thread():
+        while not stop.is_set():
+            Other.avro_schema()
+
+    thread = threading.Thread(target=other_thread)
+    try:
+        with instrumentation.profile() as p:
+            thread.start()
+            Outer.avro_schema()
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+        instrumentation.remove_callback(events.append)
+
+    # Only the measurements of the thread of the profile are collected
+    assert set(p.stats()["phases"]["avro_schema"]) == {"Outer"}
+    assert {e.model for e in events} == {"Outer"}
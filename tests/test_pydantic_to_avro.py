@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+from typing import List, Optional
+
+import pytest
+from fastavro import parse_schema
+
+from pydantic_avro.__main__ import main
+from pydantic_avro.base import AvroBase, AvroSchemaMemo
+from pydantic_avro.pydantic_to_avro import find_models, models_to_avsc
+
+
+class Country(AvroBase):
+    code: str
+
+
+class Address(AvroBase):
+    street: str
+    country: Country
+
+
+class Customer(AvroBase):
+    name: str
+    address: Address
+    billing_address: Optional[Address]
+
+
+class Order(AvroBase):
+    customer: Customer
+    shipping: List[Address]
+
+
+def test_find_models():
+    assert find_models(["tests.test_pydantic_to_avro"]) == [Address, Country, Customer, Order]
+
+
+def test_memo_standalone():
+    memo = AvroSchemaMemo()
+    customer = Customer.avro_schema(memo=memo)
+    order = Order.avro_schema(memo=memo)
+
+    assert customer == Customer.avro_schema()
+    assert order == Order.avro_schema()
+    # Shared nested definitions are only converted once
+    assert order["fields"][0]["type"]["fields"][1]["type"] is customer["fields"][1]["type"]
+    parse_schema(customer)
+    parse_schema(order)
+
+
+def test_models_to_avsc_standalone():
+    result = models_to_avsc([Order, Customer])
+    assert list(result) == ["tests.test_pydantic_to_avro.Order", "tests.test_pydantic_to_avro.Customer"]
+    assert result["tests.test_pydantic_to_avro.Order"] == Order.avro_schema()
+    assert result["tests.test_pydantic_to_avro.Customer"] == Customer.avro_schema()
+
+
+def test_models_to_avsc_deduplicate():
+    result = models_to_avsc([Order, Customer, Address], deduplicate=True)
+    assert list(result.values()) == [
+        {
+            "type": "record",
+            "namespace": "tests.test_pydantic_to_avro",
+            "name": "Address",
+            "fields": [
+                {"name": "street", "type": "string"},
+                {
+                    "name": "country",
+                    "type": {"type": "record", "fields": [{"name": "code", "type": "string"}], "name": "Country"},
+                },
+            ],
+        },
+        {
+            "type": "record",
+            "namespace": "tests.test_pydantic_to_avro",
+            "name": "Customer",
+            "fields": [
+                {"name": "name", "type": "string"},
+                {"name": "address", "type": "tests.test_pydantic_to_avro.Address"},
+                {"name": "billing_address", "type": ["null", "tests.test_pydantic_to_avro.Address"], "default": None},
+            ],
+        },
+        {
+            "type": "record",
+            "namespace": "tests.test_pydantic_to_avro",
+            "name": "Order",
+            "fields": [
+                {"name": "customer", "type": "tests.test_pydantic_to_avro.Customer"},
+                {"name": "shipping", "type": {"type": "array", "items": "tests.test_pydantic_to_avro.Address"}},
+            ],
+        },
+    ]
+    # All schemas together must be valid, shared types are defined once
+    parse_schema(list(result.values()))
+
+
+def test_cli_pydantic_to_avro():
+    with tempfile.TemporaryDirectory() as dir:
+        output = os.path.join(dir, "schemas.json")
+        main(["pydantic_to_avro", "--module", "tests.test_pydantic_to_avro", "--output", output, "--deduplicate"])
+        with open(output) as fh:
+            result = json.load(fh)
+    assert list(result) == [
+        "tests.test_pydantic_to_avro.Country",
+        "tests.test_pydantic_to_avro.Address",
+        "tests.test_pydantic_to_avro.Customer",
+        "tests.test_pydantic_to_avro.Order",
+    ]
+    parse_schema(list(result.values()))
+
+
+def test_models_to_avsc_same_class_name():
+    models = find_models(["tests.duplicate_models", "tests.test_pydantic_to_avro"])
+    result = models_to_avsc(models, deduplicate=True)
+    assert result["tests.duplicate_models.Address"]["namespace"] == "tests.duplicate_models"
+    customer = result["tests.test_pydantic_to_avro.Customer"]
+    assert customer["fields"][1] == {"name": "address", "type": "tests.test_pydantic_to_avro.Address"}
+    parse_schema(list(result.values()))
+
+    with pytest.raises(ValueError):
+        models_to_avsc(models, namespace="models", deduplicate=True)
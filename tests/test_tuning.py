@@ -0,0 +1,123 @@
+import io
+import os
+import tempfile
+from datetime import date
+
+from fastavro import reader
+
+from pydantic_avro import tuning
+from pydantic_avro.compression import CODECS
+from pydantic_avro.ocf import MIN_BLOCK_SIZE, AvroFileWriter
+from tests.test_dataset import Event
+from tests.test_to_avro import Status
+
+
+def make_events(n: int) -> list:
+    return [Event(tenant=f"t{i % 7}", day=date(2022, 1, i % 28 + 1), status=Status.passed, value=i) for i in range(n)]
+
+
+def read(data: bytes) -> tuple:
+    avro_reader = reader(io.BytesIO(data))
+    return avro_reader.metadata["avro.codec"], [Event.parse_obj(r) for r in avro_reader]
+
+
+def test_codecs():
+    events = make_events(500)
+    for codec, compression in CODECS.items():
+        for level in compression.levels:
+            fh = io.BytesIO()
+            with AvroFileWriter(fh, Event.avro_codec(), codec=codec, level=level, block_size=1024) as writer:
+                for event in events:
+                    writer.write(event)
+            assert read(fh.getvalue()) == (codec, events)
+
+
+def test_tune():
+    events = make_events(2000)
+    result = tuning.tune_records(events, Event.avro_codec(), goal="size", block_sizes=[1024, 16 * 1024])
+    assert len(result.candidates) == 2 * sum(len(c.levels) for c in CODECS.values())
+    best = min(result.candidates, key=lambda c: c.size)
+    assert (result.codec, result.level, result.block_size) == (best.codec, best.level, best.block_size)
+
+    result = tuning.tune_records(events, Event.avro_codec(), goal="throughput", codecs=["null", "xz"])
+    assert result.codec == "null"
+
+
+def test_tune_small_sample():
+    # 1000 records are smaller than every block size, so only the preferred block size is a candidate
+    events = make_events(1000)
+    result = tuning.tune_records(events, Event.avro_codec(), goal="balanced", block_size=64 * 1024)
+    assert {c.block_size for c in result.candidates} == {64 * 1024}
+    assert result.block_size == 64 * 1024
+
+    result = tuning.tune_records(events, Event.avro_codec(), goal="size", block_sizes=[1024, 4096, 1024 * 1024])
+    assert {c.block_size for c in result.candidates} == {1024, 4096}
+
+
+def test_auto_writer_sample_size():
+    tuning._tunings.clear()
+    events = make_events(2000)
+    fh = io.BytesIO()
+    with AvroFileWriter(fh, Event.avro_codec(), codec="auto", tune_records=100) as writer:
+        for event in events:
+            writer.write(event)
+        # Sampling goes on until the largest block size is filled
+        assert (writer.size, writer.pending_records) == (0, 2000)
+    assert read(fh.getvalue())[1] == events
+    tuning._tunings.clear()
+
+
+def test_auto_writer():
+    tuning._tunings.clear()
+    events = make_events(300)
+    fh = io.BytesIO()
+    with AvroFileWriter(fh, Event.avro_codec(), codec="auto", tune_records=100, goal="size") as writer:
+        for event in events:
+            writer.write(event)
+    picked = tuning.get_tuning(Event, "size")
+    assert picked is not None
+    assert tuning.get_tuning(Event) is None
+    assert writer.codec == picked.codec
+    assert writer.records == 300
+    assert read(fh.getvalue()) == (picked.codec, events)
+
+    # The next writer of the same model and goal uses the picked setting right away
+    tuning.set_tuning(Event, tuning.Tuning("deflate", 1, 1024))
+    fh = io.BytesIO()
+    with AvroFileWriter(fh, Event.avro_codec(), codec="auto") as writer:
+        for event in events[:10]:
+            writer.write(event)
+    assert read(fh.getvalue()) == ("deflate", events[:10])
+    # Another goal is tuned again
+    tuning.set_tuning(Event, tuning.Tuning("bzip2", 9, 1024), "size")
+    fh = io.BytesIO()
+    with AvroFileWriter(fh, Event.avro_codec(), codec="auto", goal="throughput") as writer:
+        for event in events[:10]:
+            writer.write(event)
+    assert tuning.get_tuning(Event, "throughput") is not None
+
+    # Records of less than a sample
+    fh = io.BytesIO()
+    with AvroFileWriter(fh, Event.avro_schema(), codec="auto") as writer:
+        for event in events[:10]:
+            writer.write(event.dict())
+    assert read(fh.getvalue())[1] == events[:10]
+
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, "tunings.json")
+        tuning.save_tunings(path)
+        tuning._tunings.clear()
+        tuning.load_tunings(path)
+    assert tuning.get_tuning(Event) == tuning.Tuning("deflate", 1, 1024)
+    assert tuning.get_tuning(Event, "size") == tuning.Tuning("bzip2", 9, 1024)
+    tuning._tunings.clear()
+
+
+def test_adaptive_block_size():
+    events = make_events(1000)
+    fh = io.BytesIO()
+    with AvroFileWriter(fh, Event.avro_codec(), codec="deflate", block_size=8192, target_block_time=1e-6) as writer:
+        for event in events:
+            writer.write(event)
+    assert writer.block_size == MIN_BLOCK_SIZE
+    assert read(fh.getvalue()) == ("deflate", events)